@@ -0,0 +1,96 @@
+# Gameplay analytics: every answer is appended to a local SQLite database for later analysis
+# with analytics_query.py. Events are buffered in memory and written in batches by a background
+# thread, so recording an answer never waits on the disk.
+import sqlite3
+import threading
+import time
+
+ANALYTICS_PATH = "analytics.db"
+BATCH_SIZE = 512  # Events that wake the writer early
+FLUSH_INTERVAL = 1.0  # Seconds between writes otherwise
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    recorded_at REAL NOT NULL,      -- Unix time
+    session TEXT NOT NULL,          -- One game run or server connection
+    asked TEXT NOT NULL,            -- Component key the question was about
+    clicked TEXT NOT NULL,          -- Component key that was clicked
+    correct INTEGER NOT NULL,
+    response_ms REAL NOT NULL,      -- From the question being shown to the click
+    difficulty TEXT NOT NULL
+)
+"""
+INSERT = "INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def open_database(path):
+    connection = sqlite3.connect(path)
+    # Write-ahead logging lets reports read while the game appends; NORMAL sync is safe in WAL mode
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(SCHEMA)
+    connection.commit()
+    return connection
+
+
+class AnalyticsRecorder:
+    """Append-only answer log, written to SQLite in batches from a background thread.
+
+    record() only appends to an in-memory list, so it can be called from the game loop.
+    close() writes whatever is still buffered and stops the writer.
+    """
+
+    def __init__(self, path=ANALYTICS_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.failed = False
+        self.written = 0
+        self.thread = threading.Thread(target=self.run, name="analytics-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, session, asked, clicked, response_ms, difficulty):
+        if self.failed:
+            return
+        event = (time.time(), session, asked, clicked, int(asked == clicked), response_ms, difficulty)
+        with self.lock:
+            self.pending.append(event)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    def run(self):
+        # The connection lives on this thread only; each batch is one transaction
+        try:
+            connection = open_database(self.path)
+        except sqlite3.Error as error:
+            print(f"Warning: could not open {self.path} ({error}). Answers will not be recorded.")
+            self.failed = True
+            return
+        try:
+            while True:
+                self.wake.wait(self.flush_interval)
+                self.wake.clear()
+                closed = self.closed
+                with self.lock:
+                    batch, self.pending = self.pending, []
+                if batch:
+                    with connection:
+                        connection.executemany(INSERT, batch)
+                    self.written += len(batch)
+                if closed:
+                    break
+        except sqlite3.Error as error:
+            print(f"Warning: writing to {self.path} failed ({error}). Answers will not be recorded.")
+            self.failed = True
+        finally:
+            connection.close()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
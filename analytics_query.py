@@ -0,0 +1,82 @@
+# Reports over the answer log written by analytics.py. Aggregates run inside SQLite in a single
+# pass over the table, so they work on millions of answers without loading them into memory,
+# and the database is opened read-only, so a running game can keep appending meanwhile.
+# Run from the repository root: python analytics_query.py [analytics.db] [--difficulty hard]
+import argparse
+import sqlite3
+from contextlib import closing
+
+from analytics import ANALYTICS_PATH
+
+
+def connect(path):
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def where_difficulty(difficulty):
+    return ("WHERE difficulty = ?", (difficulty,)) if difficulty else ("", ())
+
+
+def component_error_rates(path, difficulty=None):
+    # (component, answers, errors, error rate, mean response ms) per asked component, worst first
+    where, params = where_difficulty(difficulty)
+    with closing(connect(path)) as connection:
+        rows = connection.execute(f"""
+            SELECT asked, COUNT(*), COUNT(*) - SUM(correct), AVG(response_ms)
+            FROM answers {where}
+            GROUP BY asked
+        """, params)
+        rates = [(asked, answers, errors, errors / answers, response_ms)
+                 for asked, answers, errors, response_ms in rows]
+    rates.sort(key=lambda rate: rate[3], reverse=True)
+    return rates
+
+
+def confusions(path, difficulty=None, limit=10):
+    # Most common wrong answers as (asked, clicked, count)
+    where, params = where_difficulty(difficulty)
+    condition = f"{where} AND correct = 0" if where else "WHERE correct = 0"
+    with closing(connect(path)) as connection:
+        return connection.execute(f"""
+            SELECT asked, clicked, COUNT(*) AS mistakes
+            FROM answers {condition}
+            GROUP BY asked, clicked
+            ORDER BY mistakes DESC
+            LIMIT ?
+        """, params + (limit,)).fetchall()
+
+
+def iter_answers(path, batch_size=10000):
+    # Stream every recorded answer in insertion order for custom analyses, a batch at a time
+    with closing(connect(path)) as connection:
+        cursor = connection.execute("SELECT * FROM answers ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-component error rates from the answer log")
+    parser.add_argument('path', nargs='?', default=ANALYTICS_PATH, help="analytics database")
+    parser.add_argument('--difficulty', help="only count answers given at this difficulty")
+    args = parser.parse_args()
+
+    try:
+        rates = component_error_rates(args.path, args.difficulty)
+    except sqlite3.OperationalError as error:
+        raise SystemExit(f"Cannot read {args.path}: {error}")
+    print(f"{'component':<10} {'answers':>9} {'errors':>8} {'error rate':>11} {'mean response':>14}")
+    for asked, answers, errors, error_rate, response_ms in rates:
+        print(f"{asked:<10} {answers:>9} {errors:>8} {error_rate:>11.1%} {response_ms:>11.0f} ms")
+
+    mistakes = confusions(args.path, args.difficulty)
+    if mistakes:
+        print("\nMost common mix-ups:")
+        for asked, clicked, count in mistakes:
+            print(f"  asked {asked}, clicked {clicked}: {count}")
+
+
+if __name__ == "__main__":
+    main()
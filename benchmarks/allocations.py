@@ -0,0 +1,87 @@
+# Checks that steady-state frames render without allocating, using tracemalloc.
+# Exits non-zero when a scenario goes over its budget, so it can gate changes like a test.
+# Run from the repository root: python -m benchmarks.allocations
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import sys
+import tracemalloc
+
+import pygame
+
+from benchmarks.harness import SimulatedClock, component_point, motion
+from under_the_hood_challenge import UnderTheHoodGame, RENDER_DIRTY_RECTS, RENDER_FULL_FLIP
+
+WARMUP_FRAMES = 120
+MEASURED_FRAMES = 600
+
+
+def idle(game, frame):
+    return []
+
+
+def hover_cycle(game, frame):
+    # Alternate between two components every 10 frames; after warm-up every overlay comes from cache
+    if frame % 10:
+        return []
+    keys = list(game.components)
+    return [motion(component_point(game, keys[(frame // 10) % 2]))]
+
+
+# Scenario, render mode, allowed peak bytes allocated by draw() in one frame, allowed bytes retained
+SCENARIOS = [
+    ('idle, dirty rects', idle, RENDER_DIRTY_RECTS, 0, 0),
+    # Presents the whole frame every time; the screen is only recomposited when something changed
+    ('idle, full flip', idle, RENDER_FULL_FLIP, 0, 0),
+    # Overlay changes look up cached overlays and clip dirty rects, but create no surfaces
+    ('hover cycle, dirty rects', hover_cycle, RENDER_DIRTY_RECTS, 1024, 0),
+]
+
+
+def measure(script, render_mode):
+    game = UnderTheHoodGame(render_mode=render_mode)
+    game.wait_for_assets()
+    game.game_clock.set_time_source(SimulatedClock())
+
+    worst_peak = 0
+    retained = 0
+    for frame in range(WARMUP_FRAMES + MEASURED_FRAMES):
+        for event in script(game, frame):
+            pygame.event.post(event)
+        game.handle_events()
+        game.update()
+
+        if frame < WARMUP_FRAMES:
+            game.draw()
+            continue
+        if frame == WARMUP_FRAMES:
+            tracemalloc.start()
+
+        # Only draw() is measured: the render path is what must not allocate
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        game.draw()
+        current, peak = tracemalloc.get_traced_memory()
+        worst_peak = max(worst_peak, peak - before)
+        retained += current - before
+
+    tracemalloc.stop()
+    return worst_peak, retained
+
+
+def main():
+    failed = False
+    print(f"{'scenario':<26} {'peak B/frame':>12} {'budget':>7} {'retained B':>10}")
+    for name, script, render_mode, peak_budget, retained_budget in SCENARIOS:
+        peak, retained = measure(script, render_mode)
+        ok = peak <= peak_budget and retained <= retained_budget
+        failed |= not ok
+        print(f"{name:<26} {peak:>12} {peak_budget:>7} {retained:>10}  {'ok' if ok else 'OVER BUDGET'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Measures the analytics answer log: what recording an answer costs the game loop, compared with
+# a synchronous SQLite insert per answer, and how long per-component error rates take over a
+# large log, with the peak Python memory the query needs.
+# Run from the repository root: python -m benchmarks.answer_log [--answers 1000000]
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from analytics import AnalyticsRecorder, open_database, INSERT
+from analytics_query import component_error_rates
+
+COMPONENTS = "ABCDEF"
+TIMED_ANSWERS = 500
+ANSWER_GAP = 0.002  # Seconds between timed answers, a burst far faster than anyone clicks
+
+
+def fake_answer(rng):
+    asked = rng.choice(COMPONENTS)
+    clicked = asked if rng.random() < 0.8 else rng.choice(COMPONENTS)
+    return asked, clicked, rng.uniform(400, 6000), rng.choice(("easy", "normal", "hard"))
+
+
+def time_answers(record, rng):
+    # Microseconds the game loop spends per recorded answer
+    samples = []
+    for _ in range(TIMED_ANSWERS):
+        asked, clicked, response_ms, difficulty = fake_answer(rng)
+        start = time.perf_counter()
+        record("timed", asked, clicked, response_ms, difficulty)
+        samples.append((time.perf_counter() - start) * 1e6)
+        time.sleep(ANSWER_GAP)
+    return samples
+
+
+def time_synchronous(path, rng):
+    # The naive approach: one committed insert per answer, on the game loop
+    connection = open_database(path)
+
+    def record(session, asked, clicked, response_ms, difficulty):
+        with connection:
+            connection.execute(INSERT, (time.time(), session, asked, clicked, int(asked == clicked),
+                                        response_ms, difficulty))
+    samples = time_answers(record, rng)
+    connection.close()
+    return samples
+
+
+def time_batched(path, rng):
+    recorder = AnalyticsRecorder(path)
+    samples = time_answers(recorder.record, rng)
+    recorder.close()
+    return samples
+
+
+def fill(path, answers, rng):
+    # Record answers as fast as possible to build a large log and measure write throughput
+    recorder = AnalyticsRecorder(path)
+    start = time.perf_counter()
+    for i in range(answers):
+        recorder.record(f"session-{i // 6}", *fake_answer(rng))
+    recorder.close()
+    return recorder.written, time.perf_counter() - start
+
+
+def describe(samples):
+    samples = sorted(samples)
+    return (f"mean {sum(samples) / len(samples):8.2f} us  p99 {samples[int(len(samples) * 0.99)]:8.2f} us  "
+            f"max {samples[-1]:9.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer log write and query benchmark")
+    parser.add_argument('--answers', type=int, default=1_000_000, help="answers to record and query")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"synchronous insert per answer   {describe(time_synchronous(os.path.join(directory, 'sync.db'), rng))}")
+        print(f"batched record() per answer     {describe(time_batched(os.path.join(directory, 'timed.db'), rng))}")
+
+        path = os.path.join(directory, "answers.db")
+        written, seconds = fill(path, args.answers, rng)
+        print(f"wrote {written} answers in {seconds:.1f} s ({written / seconds:,.0f} answers/s)")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        rates = component_error_rates(path)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"error rates over {sum(rate[1] for rate in rates)} answers in {seconds:.2f} s, "
+              f"peak Python memory {peak / 1024:.0f} KiB")
+        for asked, answers, errors, error_rate, response_ms in rates:
+            print(f"  {asked}: {error_rate:.1%} of {answers}")
+
+
+if __name__ == "__main__":
+    main()
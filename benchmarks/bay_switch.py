@@ -0,0 +1,151 @@
+# Plays rounds back to back through a large synthetic question bank and reports the frame times
+# of the frames that switch bays against all other frames, next to what preparing a bay inline
+# on the game loop would cost. Frames are paced at FPS so the bay loader gets the time it would
+# have in a real game; answers come quickly (see ANSWER_DELAY) so rounds are short.
+# Run from the repository root: python -m benchmarks.bay_switch [--bays 40 --components 24]
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import pygame
+
+from under_the_hood_challenge import UnderTheHoodGame, GAME_PLAYING, FPS, prepare_bay
+from benchmarks.harness import SimulatedClock, click, key_press, component_point, summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES = ["battery.png", "brake_fluid.png", "coolant_reservoir.png", "oil_cap.png", "oil_dipstick.png",
+          "washer_reservoir.png"]
+ENGINE_SIZE = (700, 450)
+ANSWER_DELAY = 150  # Milliseconds, instead of the game's 800
+
+
+def write_bank(directory, bays, components, rng):
+    # Bays of real PNGs at random sizes and positions, so every bay has to be decoded from scratch
+    entries = []
+    for bay in range(bays):
+        manifest = {
+            'background': {'image': os.path.join(REPO_ROOT, "car_engine.png"), 'size': list(ENGINE_SIZE),
+                           'color': [50, 50, 50]},
+            'components': [],
+        }
+        for index in range(components):
+            size = [rng.randint(40, 120), rng.randint(30, 90)]
+            manifest['components'].append({
+                'key': f"{bay}-{index}",
+                'image': os.path.join(REPO_ROOT, rng.choice(IMAGES)),
+                'name': f"Part {index} of bay {bay}",
+                'position': [rng.randint(size[0] // 2, ENGINE_SIZE[0] - size[0] // 2),
+                             rng.randint(size[1] // 2, ENGINE_SIZE[1] - size[1] // 2)],
+                'size': size,
+                'color': [rng.randrange(256) for _ in range(3)],
+                'description': f"Synthetic component {index}.",
+            })
+        path = os.path.join(directory, f"bay{bay}.json")
+        with open(path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file)
+        entries.append({'manifest': path})
+
+    bank_path = os.path.join(directory, "bank.json")
+    with open(bank_path, "w", encoding="utf-8") as bank_file:
+        json.dump({'bays': entries}, bank_file)
+    return bank_path, entries
+
+
+def play(game, script_rng):
+    # Answer whatever is asked, sometimes wrongly, and press R as soon as a round is over
+    session = game.session
+    if session.game_state != GAME_PLAYING:
+        return key_press(pygame.K_r)
+    if session.awaiting_next_question:
+        return []
+    target = session.current_question
+    if script_rng.random() < 0.3:
+        target = script_rng.choice(list(game.components))
+    return click(component_point(game, target))
+
+
+def run(bank_path, rounds, cache_bytes):
+    random.seed(0)
+    script_rng = random.Random(0)
+    game = UnderTheHoodGame(bank_path=bank_path)
+    game.bank.max_bytes = cache_bytes
+    game.wait_for_assets()
+    game.answer_delay = ANSWER_DELAY
+    game_clock = SimulatedClock()
+    game.game_clock.set_time_source(game_clock)
+
+    switch_frames, other_frames = [], []
+    restarts = replays = 0
+    frame_s = 1 / FPS
+    while restarts < rounds:
+        frame_start = time.perf_counter()
+        for event in play(game, script_rng):
+            pygame.event.post(event)
+        bay_index, state = game.bay_index, game.session.game_state
+
+        start = time.perf_counter()
+        game.handle_events()
+        game.update()
+        game.draw()
+        elapsed = (time.perf_counter() - start) * 1000
+
+        restarted = state != GAME_PLAYING and game.session.game_state == GAME_PLAYING
+        if restarted:
+            restarts += 1
+            replays += game.bay_index == bay_index  # The next bay wasn't ready, this one is replayed
+        (switch_frames if restarted and game.bay_index != bay_index else other_frames).append(elapsed)
+        game_clock.step()
+        time.sleep(max(0.0, frame_s - (time.perf_counter() - frame_start)))
+
+    game.bank.shutdown()
+    return switch_frames, other_frames, replays, game.bank
+
+
+def time_inline(entries):
+    # What a switch would cost if the bay were loaded on the game loop, conversion included
+    samples = []
+    for entry in entries[:5]:
+        start = time.perf_counter()
+        bay = prepare_bay(entry)
+        for data in bay['components'].values():
+            data['image'].convert_alpha()
+        bay['background'].convert()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def describe(summary):
+    return f"mean {summary['mean']:7.2f} ms  p99 {summary['p99']:7.2f} ms  max {summary['max']:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bay switching frame times")
+    parser.add_argument('--bays', type=int, default=40, help="engine bays in the synthetic bank")
+    parser.add_argument('--components', type=int, default=24, help="components per bay")
+    parser.add_argument('--rounds', type=int, default=20, help="rounds to play")
+    parser.add_argument('--cache-mb', type=float, default=8, help="memory budget for prepared bays")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bank_path, entries = write_bank(directory, args.bays, args.components, random.Random(0))
+        switch_frames, other_frames, replays, bank = run(bank_path, args.rounds, int(args.cache_mb * 1024 * 1024))
+        inline = time_inline(entries)
+
+    print(f"{args.bays} bays of {args.components} components, {args.rounds} rounds")
+    print(f"bay switch frames    {describe(summarize(switch_frames))}  ({len(switch_frames)} switches, "
+          f"{replays} replays while loading)")
+    print(f"other frames         {describe(summarize(other_frames))}")
+    print(f"bay loaded inline    {describe(inline)}")
+    print(f"bay cache            {len(bank.cache)} bays, {bank.cached_bytes / 1024 / 1024:.1f} MiB "
+          f"of {args.cache_mb:g} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Compares display pixel traffic of full-flip and dirty-rect rendering.
+# Run from the repository root: python -m benchmarks.dirty_rects
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import time
+
+import pygame
+
+from benchmarks.harness import component_point
+from under_the_hood_challenge import (UnderTheHoodGame, RENDER_FULL_FLIP, RENDER_DIRTY_RECTS,
+                                      SCREEN_WIDTH, SCREEN_HEIGHT)
+
+FRAMES = 600
+
+
+def build_script(game):
+    # Frame number -> mouse position: idle, then sweep across every component, then idle again
+    script = {}
+    frame = 60
+    for component in game.components:
+        script[frame] = component_point(game, component)
+        frame += 45
+        script[frame] = (SCREEN_WIDTH // 2, SCREEN_HEIGHT - 10)  # Move off the engine bay
+        frame += 15
+    return script
+
+
+def run_session(render_mode):
+    game = UnderTheHoodGame(render_mode=render_mode)
+    game.wait_for_assets()
+    script = build_script(game)
+
+    presented = pixels = 0
+    start = time.perf_counter()
+    for frame in range(FRAMES):
+        if frame in script:
+            pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=script[frame], rel=(0, 0), buttons=(0, 0, 0)))
+        game.handle_events()
+        game.update()
+        rects = game.draw()
+        if rects:
+            presented += 1
+            pixels += sum(rect.width * rect.height for rect in rects)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'frames': FRAMES,
+        'presented': presented,
+        'pixels': pixels,
+        'ms_per_frame': elapsed * 1000 / FRAMES,
+    }
+
+
+def main():
+    results = {
+        'full flip': run_session(RENDER_FULL_FLIP),
+        'dirty rects': run_session(RENDER_DIRTY_RECTS),
+    }
+
+    print(f"{'mode':<12} {'presented':>10} {'pixels':>12} {'px/frame':>10} {'ms/frame':>9}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['presented']:>10} {result['pixels']:>12} "
+              f"{result['pixels'] // result['frames']:>10} {result['ms_per_frame']:>9.3f}")
+
+    saved = 1 - results['dirty rects']['pixels'] / results['full flip']['pixels']
+    print(f"Dirty-rect mode pushed {saved:.1%} fewer pixels to the display.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# Headless benchmark harness: plays scripted sessions under the SDL dummy drivers and reports
+# per-frame timings of handle_events(), update() and draw().
+# Run from the repository root:
+#   python -m benchmarks.harness                  compare against benchmarks/baseline.json
+#   python -m benchmarks.harness --save-baseline  record a new baseline on this machine
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import pygame
+
+from under_the_hood_challenge import (UnderTheHoodGame, GAME_PLAYING, SCREEN_WIDTH, SCREEN_HEIGHT, FPS,
+                                      AUDIO_FREQUENCY, AUDIO_BUFFER, SIMULATION_STEP, QUESTION_TIME_LIMIT,
+                                      parse_resolution)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+FRAMES = 600
+PHASES = ('handle_events', 'update', 'draw')
+OFF_ENGINE = (SCREEN_WIDTH // 2, SCREEN_HEIGHT - 10)  # Logical position below the engine bay
+PREVIOUS_AUDIO_BUFFER = 512  # pygame's default mixer buffer, what the game used before AUDIO_BUFFER
+
+
+class SimulatedClock:
+    # Stands in for real time and advances by exactly one frame per step, so timers fire after
+    # the same number of frames no matter how fast the unthrottled loop runs
+    def __init__(self, frame_ms=1000 / FPS):
+        self.frame_ms = frame_ms
+        self.now_ms = 0.0
+
+    def __call__(self):
+        return int(self.now_ms)
+
+    def step(self, frame_ms=None):
+        self.now_ms += self.frame_ms if frame_ms is None else frame_ms
+
+
+def component_point(game, component):
+    # Screen position of the mask centroid, the image centre can be transparent
+    data = game.components[component]
+    engine_x, engine_y = game.get_engine_origin()
+    x, y = data['mask'].centroid()
+    return game.to_screen((data['rect'].x + x + engine_x, data['rect'].y + y + engine_y))
+
+
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+
+
+def click(pos):
+    return [motion(pos), pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)]
+
+
+def key_press(key):
+    return [pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0)]
+
+
+def hover_sweep(game, frame):
+    # Move to a new component every 10 frames, leaving the engine bay in between
+    if frame % 10:
+        return []
+    keys = list(game.components)
+    step = frame // 10
+    if step % 2:
+        return [motion(game.to_screen(OFF_ENGINE))]
+    return [motion(component_point(game, keys[(step // 2) % len(keys)]))]
+
+
+def tooltip_hold(game, frame):
+    # Rest on each component for a second so its tooltip stays up
+    if frame % 60:
+        return []
+    keys = list(game.components)
+    return [motion(component_point(game, keys[(frame // 60) % len(keys)]))]
+
+
+def answer_round(game, frame):
+    # Answer every question as soon as it is asked, getting every third one wrong
+    if game.session.game_state != GAME_PLAYING or game.session.awaiting_next_question or frame % 5:
+        return []
+    target = game.session.current_question
+    if game.session.total_questions % 3 == 2:
+        target = next(key for key in game.components if key != game.session.current_question)
+    return click(component_point(game, target))
+
+
+def restart_loop(game, frame):
+    # Play rounds back to back, pressing R as soon as one is over
+    if game.session.game_state != GAME_PLAYING:
+        return key_press(pygame.K_r)
+    return answer_round(game, frame)
+
+
+SCENARIOS = {
+    'hover': hover_sweep,
+    'tooltip': tooltip_hold,
+    'click': answer_round,
+    'restart': restart_loop,
+}
+
+
+# Simulated frame durations in ms for the countdown accuracy check: rendering slowed down, uneven,
+# stalling, and stalling for longer than the game clock catches up on
+TIMER_PROFILES = {
+    'steady 60 fps': lambda rng: 1000 / FPS,
+    'slowed to 20 fps': lambda rng: 50.0,
+    'jittery 8-60 fps': lambda rng: rng.uniform(1000 / FPS, 125.0),
+    '400 ms stalls': lambda rng: 400.0 if rng.random() < 0.02 else 1000 / FPS,
+    '2 s stalls': lambda rng: 2000.0 if rng.random() < 0.005 else 1000 / FPS,
+}
+
+
+def measure_countdowns(frame_duration, seed=0):
+    # Play a hard mode round without answering, so every question runs out of time, while each
+    # frame takes frame_duration(rng) ms of simulated real time. Returns the real length of every
+    # countdown with the real time the game clock skipped during it, and the mean and longest frame.
+    random.seed(seed)
+    rng = random.Random(seed)
+    game = UnderTheHoodGame()
+    game.wait_for_assets()
+    clock = SimulatedClock()
+    game.game_clock.set_time_source(clock)
+    game.set_difficulty("hard")
+
+    countdowns = []
+    frame_times = []
+    shown_at = clock.now_ms
+    origin = game.game_clock.origin  # Moves forward by the real time skipped after stalls
+    while game.session.game_state == GAME_PLAYING:
+        awaiting = game.session.awaiting_next_question
+        game.handle_events()
+        game.update()
+        game.draw()
+        if awaiting and not game.session.awaiting_next_question:
+            shown_at = clock.now_ms
+            origin = game.game_clock.origin
+        elif not awaiting and game.session.awaiting_next_question:
+            countdowns.append((clock.now_ms - shown_at, game.game_clock.origin - origin))
+        frame_times.append(frame_duration(rng))
+        clock.step(frame_times[-1])
+    return countdowns, sum(frame_times) / len(frame_times), max(frame_times)
+
+
+def check_timers(seed=0):
+    # Countdowns must last their time to within a frame and a simulation step, whatever the frame
+    # rate, apart from real time skipped after stalls during that countdown. Returns whether all
+    # profiles passed.
+    expected = QUESTION_TIME_LIMIT * 1000
+    title = f"countdown ({QUESTION_TIME_LIMIT} s)"
+    print(f"\n{title:<18} {'mean s':>7} {'max error ms':>13} {'frame ms':>9} {'skipped ms':>11} {'600 frames s':>13}")
+    passed = True
+    for name, frame_duration in TIMER_PROFILES.items():
+        countdowns, mean_frame, longest_frame = measure_countdowns(frame_duration, seed)
+        durations = [duration for duration, skipped in countdowns]
+        skipped = sum(skipped for duration, skipped in countdowns)
+        error = max(abs(duration - skipped - expected) for duration, skipped in countdowns)
+        ok = error <= longest_frame + SIMULATION_STEP
+        passed &= ok
+        # Last column: how long the same countdown would take if it counted 60 FPS frames instead
+        print(f"{name:<18} {sum(durations) / len(durations) / 1000:>7.3f} {error:>13.1f} {longest_frame:>9.1f} "
+              f"{skipped:>11.0f} {expected / (1000 / FPS) * mean_frame / 1000:>13.1f}  {'ok' if ok else 'INACCURATE'}")
+    return passed
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'mean': sum(samples) / len(samples),
+        'p50': percentile(samples, 0.50),
+        'p99': percentile(samples, 0.99),
+        'max': samples[-1],
+    }
+
+
+def run_scenario(script, frames=FRAMES, seed=0, game_factory=UnderTheHoodGame):
+    random.seed(seed)
+    game = game_factory()
+    game.wait_for_assets()
+    game_clock = SimulatedClock()
+    game.game_clock.set_time_source(game_clock)
+
+    timings = {phase: [] for phase in PHASES}
+    timings['frame'] = []
+    clock = time.perf_counter
+    start = clock()
+
+    # Click-to-sound latency: from the frame that receives the click until the mixer has mixed the
+    # start of the answer cue. Channel.get_busy() turns true as soon as play() returns, so one sample
+    # of silence is started on a spare channel along with the cue; that channel goes idle in the
+    # mixer callback that mixes the cue's first samples.
+    sound_latencies = []
+    mixer = pygame.mixer.get_init()
+    probe = pygame.mixer.Sound(buffer=bytes(abs(mixer[1]) // 8 * mixer[2])) if mixer else None
+    probe_channel = pygame.mixer.find_channel(True) if mixer else None
+    play = game.audio.play
+
+    def timed_play(name):
+        nonlocal start
+        play(name)
+        if probe is not None and name in ('correct', 'wrong') and name in game.audio.sounds:
+            probe_channel.play(probe)
+            waiting = clock()
+            while probe_channel.get_busy():
+                time.sleep(0.0001)
+            mixed = clock()
+            sound_latencies.append((mixed - start) * 1000)
+            start += mixed - waiting  # Leave the wait out of this frame's timings
+    game.audio.play = timed_play
+
+    for frame in range(frames):
+        for event in script(game, frame):
+            pygame.event.post(event)
+
+        start = clock()
+        game.handle_events()
+        after_events = clock()
+        game.update()
+        after_update = clock()
+        game.draw()
+        end = clock()
+
+        # Milliseconds per phase
+        timings['handle_events'].append((after_events - start) * 1000)
+        timings['update'].append((after_update - after_events) * 1000)
+        timings['draw'].append((end - after_update) * 1000)
+        timings['frame'].append((end - start) * 1000)
+        game_clock.step()
+
+    if sound_latencies:
+        timings['click_to_sound'] = sound_latencies
+    return {phase: summarize(samples) for phase, samples in timings.items()}
+
+
+def run_all(frames=FRAMES, repeats=3, output_size=None):
+    # Keep the best of several runs per metric, which filters out scheduler and cache noise
+    def game_factory():
+        return UnderTheHoodGame(output_size=output_size)
+
+    results = {}
+    for name, script in SCENARIOS.items():
+        runs = [run_scenario(script, frames, game_factory=game_factory) for _ in range(repeats)]
+        results[name] = {phase: {metric: min(run[phase][metric] for run in runs) for metric in stats}
+                         for phase, stats in runs[0].items()}
+    return results
+
+
+def compare_click_to_sound(frames=FRAMES, buffers=(AUDIO_BUFFER, PREVIOUS_AUDIO_BUFFER)):
+    # click_to_sound of the click scenario with the mixer reopened at each buffer size
+    if not pygame.mixer.get_init():
+        return {}
+    results = {}
+    for buffer in buffers:
+        pygame.mixer.quit()
+        pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, 2, buffer)
+        stats = run_scenario(SCENARIOS['click'], frames).get('click_to_sound')
+        if stats is not None:
+            results[buffer] = stats
+    pygame.mixer.quit()
+    pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, 2, AUDIO_BUFFER)
+    return results
+
+
+def print_report(results):
+    print(f"{'scenario':<9} {'phase':<14} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for scenario, phases in results.items():
+        for phase, stats in phases.items():
+            print(f"{scenario:<9} {phase:<14} {stats['mean']:>8.3f} {stats['p50']:>8.3f} "
+                  f"{stats['p99']:>8.3f} {stats['max']:>8.3f}")
+
+
+def find_regressions(results, baseline, tolerance, floor_ms=0.1):
+    # Compare mean and p99 per phase; differences below floor_ms are timer noise
+    regressions = []
+    for scenario, phases in baseline.items():
+        for phase, stats in phases.items():
+            current = results.get(scenario, {}).get(phase)
+            if current is None:
+                continue
+            for metric in ('mean', 'p99'):
+                limit = stats[metric] * (1 + tolerance) + floor_ms
+                if current[metric] > limit:
+                    regressions.append(f"{scenario}/{phase} {metric}: {current[metric]:.3f} ms "
+                                       f"(baseline {stats[metric]:.3f} ms, limit {limit:.3f} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Under the Hood Challenge benchmarks")
+    parser.add_argument('--frames', type=int, default=FRAMES, help="frames per scenario")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per scenario, the best one counts")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="allowed slowdown over the baseline, 0.5 = 50%%")
+    parser.add_argument('--resolution', metavar='WxH', type=parse_resolution,
+                        help="output resolution to render at, e.g. 3840x2160")
+    args = parser.parse_args()
+
+    results = run_all(args.frames, args.repeats, args.resolution)
+    print_report(results)
+    sound = compare_click_to_sound(args.frames)
+    if sound:
+        print(f"click_to_sound by mixer buffer, until SDL has mixed the cue "
+              f"(output latency of the {os.environ['SDL_AUDIODRIVER']} audio driver not included):")
+        for buffer, stats in sound.items():
+            note = "  (previous default)" if buffer == PREVIOUS_AUDIO_BUFFER else ""
+            print(f"  {buffer:>5} samples  mean {stats['mean']:6.2f} ms  p99 {stats['p99']:6.2f} ms{note}")
+    if not check_timers():
+        print("Countdowns drifted with the frame rate.")
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print("Performance regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
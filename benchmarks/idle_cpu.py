@@ -0,0 +1,75 @@
+# Measures how often an idle game wakes up and how much CPU it burns in the continuous and
+# power-saving loop modes, and how quickly each reacts to input.
+# Note: SDL's dummy video driver implements event waits by polling, so the CPU share measured
+# here for power-save mode is higher than with a real video driver; the wake-up count is not.
+# Run from the repository root: python -m benchmarks.idle_cpu
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import threading
+import time
+
+import pygame
+
+from under_the_hood_challenge import UnderTheHoodGame, LOOP_CONTINUOUS, LOOP_POWER_SAVE
+
+IDLE_SECONDS = 3.0
+INPUT_PROBES = 5
+
+
+def run_idle(loop_mode):
+    game = UnderTheHoodGame(loop_mode=loop_mode)
+    game.wait_for_assets()
+
+    # Wrap handle_events to count frames and time how long posted input waits before the game sees it
+    latencies = []
+    frame_times = []
+    handle_events = game.handle_events
+
+    def timed_handle_events(events=None):
+        events = pygame.event.get() if events is None else events
+        now = time.perf_counter()
+        frame_times.append(now)
+        latencies.extend(now - event.posted for event in events if event.type == pygame.USEREVENT)
+        handle_events(events)
+    game.handle_events = timed_handle_events
+
+    def poke():
+        # Idle first, then a few input events spaced out, then quit
+        time.sleep(IDLE_SECONDS)
+        for _ in range(INPUT_PROBES):
+            pygame.event.post(pygame.event.Event(pygame.USEREVENT, posted=time.perf_counter()))
+            time.sleep(0.2)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    threading.Thread(target=poke, daemon=True).start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    try:
+        game.run()
+    except SystemExit:
+        pass
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    # Frames run during the idle stretch, skipping the first second of startup work
+    idle_frames = sum(1 for t in frame_times if wall_start + 1 <= t < wall_start + IDLE_SECONDS)
+    return {
+        'cpu_share': cpu / wall,
+        'idle_fps': idle_frames / (IDLE_SECONDS - 1),
+        'latency_ms': max(latencies) * 1000 if latencies else float('nan'),
+    }
+
+
+def main():
+    print(f"{'mode':<12} {'idle frames/s':>14} {'CPU use':>8} {'worst input latency':>20}")
+    for name, mode in (('continuous', LOOP_CONTINUOUS), ('power save', LOOP_POWER_SAVE)):
+        result = run_idle(mode)
+        print(f"{name:<12} {result['idle_fps']:>14.1f} {result['cpu_share']:>8.1%} "
+              f"{result['latency_ms']:>17.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Compares the old linear mask scan with the pick buffer as the component count grows.
+# Run from the repository root: python -m benchmarks.picking
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+
+import pygame
+
+from under_the_hood_challenge import UnderTheHoodGame, SCREEN_WIDTH
+
+COMPONENT_COUNTS = [6, 50, 100, 200, 500]
+QUERIES = 20000
+
+
+def add_synthetic_components(game, count, rng):
+    # Replace the catalog with count small circular parts scattered over the engine bay
+    game.components = {}
+    width, height = game.engine_background.get_size()
+    for index in range(count):
+        size = rng.randint(12, 40)
+        img = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(img, (255, 0, 0), (size // 2, size // 2), size // 2)
+        pos = (rng.randrange(width), rng.randrange(height))
+        game.components[f"P{index}"] = {
+            'image': img,
+            'name': f"Part {index}",
+            'position': pos,
+            'rect': img.get_rect(center=pos),
+            'mask': pygame.mask.from_surface(img),
+            'original': img,
+        }
+    game.build_pick_buffer()
+
+
+def linear_pick(game, screen_pos):
+    # The per-component scan handle_events() and update() used before the pick buffer
+    engine_x = (SCREEN_WIDTH - game.engine_background.get_width()) // 2
+    engine_y = 80
+    x = screen_pos[0] - engine_x
+    y = screen_pos[1] - engine_y
+    if 0 <= x < game.engine_background.get_width() and 0 <= y < game.engine_background.get_height():
+        for component, data in game.components.items():
+            comp_rect = data['rect'].copy()
+            rel_x = x - comp_rect.x
+            rel_y = y - comp_rect.y
+            if (comp_rect.collidepoint(x, y) and
+                    0 <= rel_x < comp_rect.width and
+                    0 <= rel_y < comp_rect.height and
+                    data['mask'].get_at((rel_x, rel_y))):
+                return component
+    return None
+
+
+def time_picks(pick, game, points):
+    start = time.perf_counter()
+    for point in points:
+        pick(game, point)
+    return (time.perf_counter() - start) * 1e6 / len(points)
+
+
+def main():
+    rng = random.Random(1234)
+    game = UnderTheHoodGame()
+    game.wait_for_assets()
+    points = [(rng.randrange(50, 750), rng.randrange(80, 530)) for _ in range(QUERIES)]
+
+    print(f"{'components':>10} {'linear us':>10} {'buffer us':>10} {'build ms':>9}")
+    for count in COMPONENT_COUNTS:
+        start = time.perf_counter()
+        add_synthetic_components(game, count, rng)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        linear_us = time_picks(linear_pick, game, points)
+        buffer_us = time_picks(UnderTheHoodGame.pick_component, game, points)
+        print(f"{count:>10} {linear_us:>10.2f} {buffer_us:>10.2f} {build_ms:>9.1f}")
+
+    # Moving one part only repaints the area it left and the area it entered
+    component = next(iter(game.components))
+    start = time.perf_counter()
+    game.move_component(component, (350, 225))
+    print(f"Moving one component updated the pick buffer in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Load test for the headless quiz server: starts quiz_server.py in its own process and plays
+# many concurrent sessions against it from a local client stand-in, then reports how many
+# sessions one server core can host and how long answers take.
+# Sessions per core is extrapolated from the server's CPU time at the simulated click rate.
+# The clients share the machine with the server, so latencies include their scheduling too.
+# Run from the repository root: python -m benchmarks.sessions [--sessions 1000]
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+from quiz_server import QuizCatalog
+from benchmarks.harness import summarize
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quiz_server.py")
+
+
+def component_points(catalog):
+    # Logical screen position of each component's mask centroid, where the stand-in clicks
+    points = {}
+    for key, data in catalog.components.items():
+        x, y = data['mask'].centroid()
+        points[key] = (data['rect'].x + x + catalog.engine_origin[0], data['rect'].y + y + catalog.engine_origin[1])
+    return points
+
+
+async def request(reader, writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def play(host, port, points, think_ms, deadline, latencies, rng):
+    # One player: think, click the asked component (wrong every fourth time), restart when done
+    reader, writer = await asyncio.open_connection(host, port)
+    state = json.loads(await reader.readline())
+    answers = 0
+    try:
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+            if state['awaiting_next_question']:
+                state = await request(reader, writer, {'state': True})
+            if state['state'] != 'playing':
+                state = await request(reader, writer, {'restart': True})
+                continue
+            target = state['question']
+            if answers % 4 == 3:
+                target = next(key for key in points if key != target)
+            start = time.perf_counter()
+            state = await request(reader, writer, {'click': points[target]})
+            latencies.append((time.perf_counter() - start) * 1000)
+            answers += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, sessions, seconds, think_ms, seed):
+    points = component_points(QuizCatalog())
+    rng = random.Random(seed)
+    latencies = []
+
+    # A control connection reads the server counters; players get a moment to connect before measuring
+    control_reader, control_writer = await asyncio.open_connection(host, port)
+    await control_reader.readline()
+    deadline = time.perf_counter() + seconds
+    players = [asyncio.ensure_future(play(host, port, points, think_ms, deadline, latencies,
+                                          random.Random(rng.getrandbits(64))))
+               for _ in range(sessions)]
+    await asyncio.sleep(min(1.0, seconds / 4))
+    before = await request(control_reader, control_writer, {'stats': True})
+    wall_start = time.perf_counter()
+    latencies.clear()
+
+    await asyncio.gather(*players)
+    after = await request(control_reader, control_writer, {'stats': True})
+    wall = time.perf_counter() - wall_start
+    control_writer.close()
+    return {
+        'sessions': before['sessions'] - 1,  # Without the control connection
+        'answers_per_s': (after['answers'] - before['answers']) / wall,
+        'server_cpu': (after['cpu_seconds'] - before['cpu_seconds']) / wall,
+        'latency_ms': summarize(latencies),
+    }
+
+
+def start_server(answer_delay):
+    server = subprocess.Popen([sys.executable, SERVER_SCRIPT, '--port', '0', '--answer-delay', str(answer_delay),
+                               '--seed', '0'], stdout=subprocess.PIPE, text=True,
+                              cwd=os.path.dirname(SERVER_SCRIPT))
+    # Skip pygame's banner and any asset warnings up to the address line
+    for line in server.stdout:
+        if line.startswith("Serving"):
+            break
+    else:
+        server.kill()
+        raise RuntimeError("quiz server exited before it started listening")
+    host, port = line.rsplit(' ', 1)[1].strip().rsplit(':', 1)
+    return server, host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the headless quiz server")
+    parser.add_argument('--sessions', type=int, default=1000, help="concurrent players")
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of the measured run")
+    parser.add_argument('--think-ms', type=float, default=1000.0, help="average pause between a player's clicks")
+    parser.add_argument('--answer-delay', type=int, default=800, help="server pause before the next question")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server, host, port = start_server(args.answer_delay)
+    try:
+        result = asyncio.run(run_load(host, port, args.sessions, args.seconds, args.think_ms, args.seed))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latency = result['latency_ms']
+    sessions_per_core = result['sessions'] / result['server_cpu'] if result['server_cpu'] else float('inf')
+    print(f"sessions            {result['sessions']}")
+    print(f"answers/s           {result['answers_per_s']:.0f}")
+    print(f"server CPU          {result['server_cpu']:.1%} of one core")
+    print(f"sessions per core   {sessions_per_core:.0f} at one click per {args.think_ms:.0f} ms")
+    print(f"answer latency      mean {latency['mean']:.2f} ms  p50 {latency['p50']:.2f} ms  "
+          f"p99 {latency['p99']:.2f} ms  max {latency['max']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
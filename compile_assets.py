@@ -0,0 +1,116 @@
+# Offline asset compiler: packs every image listed in the component manifest into one binary
+# bundle that the game memory-maps at startup instead of decoding and scaling PNGs.
+#
+# Bundle layout:
+#   header  magic, version and index length (BUNDLE_HEADER)
+#   index   JSON with a digest of the manifest and its images, the mask layout and the offset of
+#           every data block
+#   data    16-byte aligned blocks: engine background pixels, sprite atlas pixels, packed masks
+#
+# Pixels are stored pre-scaled in the display's 32-bit BGRA format. Re-run this script whenever
+# components.json or any of the images change; a stale bundle is ignored by the game.
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import json
+import sys
+
+import pygame
+
+from under_the_hood_challenge import (BUNDLE_PATH, BUNDLE_MAGIC, BUNDLE_VERSION, BUNDLE_HEADER, MANIFEST_PATH,
+                                      load_manifest, decode_image, sources_digest, mask_layout)
+
+ATLAS_WIDTH = 512
+ALIGNMENT = 16
+
+
+def offset_field(entry):
+    # Pixel blocks record 'offset', mask blocks 'mask_offset'
+    return 'mask_offset' if 'mask_size' in entry else 'offset'
+
+
+def pack_atlas(sizes):
+    # Simple shelf packer: tallest sprites first, left to right, a new shelf when a row is full
+    width = max([ATLAS_WIDTH] + [w for w, h in sizes.values()])
+    positions = {}
+    x = y = shelf_height = 0
+    for key in sorted(sizes, key=lambda k: sizes[k][1], reverse=True):
+        w, h = sizes[key]
+        if x + w > width:
+            x, y = 0, y + shelf_height
+            shelf_height = 0
+        positions[key] = (x, y)
+        x += w
+        shelf_height = max(shelf_height, h)
+    return (width, y + shelf_height), positions
+
+
+def compile_bundle(manifest_path, bundle_path):
+    manifest = load_manifest(manifest_path)
+    blocks = []  # (index entry, bytes) in file order
+    index = {
+        'sources_sha256': sources_digest(manifest_path),
+        'mask_layout': mask_layout(),
+        'background': None,
+        'atlas': None,
+        'sprites': {},
+    }
+
+    background = manifest['background']
+    try:
+        img, _ = decode_image(background['image'], tuple(background['size']))
+        index['background'] = {'size': list(img.get_size())}
+        blocks.append((index['background'], pygame.image.tobytes(img, "BGRA")))
+    except (pygame.error, FileNotFoundError):
+        print(f"Skipping missing background {background['image']}")
+
+    images = {}
+    for entry in manifest['components']:
+        try:
+            images[entry['key']] = decode_image(entry['image'], tuple(entry['size']))
+        except (pygame.error, FileNotFoundError):
+            print(f"Skipping missing image {entry['image']}")
+
+    if images:
+        atlas_size, positions = pack_atlas({key: img.get_size() for key, (img, mask) in images.items()})
+        atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+        atlas.fill((0, 0, 0, 0))
+        for key, (img, mask) in images.items():
+            atlas.blit(img, positions[key], special_flags=pygame.BLEND_RGBA_MAX)  # Copy pixels including alpha
+            sprite = {'rect': [*positions[key], *img.get_size()]}
+            index['sprites'][key] = sprite
+            mask_bytes = memoryview(mask).cast('B').tobytes()
+            sprite['mask_size'] = len(mask_bytes)
+            blocks.append((sprite, mask_bytes))
+        index['atlas'] = {'size': list(atlas_size)}
+        blocks.insert(0, (index['atlas'], pygame.image.tobytes(atlas, "BGRA")))
+
+    # Offsets depend on the index length, so lay the file out until the index stops growing
+    for entry, _ in blocks:
+        entry[offset_field(entry)] = 0
+    while True:
+        encoded_index = json.dumps(index, separators=(',', ':')).encode("utf-8")
+        offset = BUNDLE_HEADER.size + len(encoded_index)
+        changed = False
+        for entry, payload in blocks:
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            if entry[offset_field(entry)] != offset:
+                entry[offset_field(entry)] = offset
+                changed = True
+            offset += len(payload)
+        if not changed:
+            break
+
+    with open(bundle_path, "wb") as bundle_file:
+        bundle_file.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(encoded_index)))
+        bundle_file.write(encoded_index)
+        for entry, payload in blocks:
+            bundle_file.write(bytes(entry[offset_field(entry)] - bundle_file.tell()))  # Alignment padding
+            bundle_file.write(payload)
+
+    print(f"Wrote {bundle_path}: {len(images)} sprites, {os.path.getsize(bundle_path)} bytes")
+
+
+if __name__ == "__main__":
+    compile_bundle(MANIFEST_PATH, sys.argv[1] if len(sys.argv) > 1 else BUNDLE_PATH)
@@ -0,0 +1,142 @@
+# Monte Carlo difficulty analysis: simulates millions of players clicking through quiz rounds on the
+# real component masks, to tune the layout and the win threshold from data. Clicks scatter around the
+# point a player aims at; where each lands is looked up in the game's pick buffer, so overlaps and
+# transparent pixels count exactly as in the game. Everything runs as batched NumPy array operations.
+# Run from the repository root: python difficulty_analysis.py [--players 1000000] [--difficulty hard]
+import argparse
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    raise SystemExit("difficulty_analysis.py needs NumPy, install it with: pip install numpy")
+
+from quiz_server import QuizCatalog
+from under_the_hood_challenge import MANIFEST_PATH, BUNDLE_PATH, QUESTIONS_PER_ROUND
+
+# Player model per difficulty: how often the asked component is recognised (otherwise a random one
+# is clicked) and the standard deviation of clicks around the aimed point, in logical pixels
+PLAYER_MODELS = {
+    'easy': {'recognition': 0.90, 'click_spread': 4.0},
+    'normal': {'recognition': 0.75, 'click_spread': 8.0},
+    'hard': {'recognition': 0.60, 'click_spread': 14.0},
+}
+MAX_RETRIES = 20  # Clicks on the background are ignored by the game, so players click again
+BATCH_PLAYERS = 250_000  # Players simulated per batch, bounds memory to a few hundred MB
+
+
+class MaskModel:
+    """The catalog as arrays: pick buffer, component names and the point players aim at for each."""
+
+    def __init__(self, catalog):
+        self.ids = catalog.pick_buffer.ids  # Pick buffer value -> component key, 0 = none
+        self.names = [None] + [catalog.names[key] for key in self.ids[1:]]
+        self.pick = np.frombuffer(catalog.pick_buffer.buffer, dtype=np.uint16).reshape(
+            catalog.pick_buffer.height, catalog.pick_buffer.width)
+
+        # Players aim at the middle of what they can see of a component: its mask centroid
+        self.aim_points = np.zeros((len(self.ids), 2))
+        for index, key in enumerate(self.ids[1:], start=1):
+            data = catalog.components[key]
+            x, y = data['mask'].centroid()
+            self.aim_points[index] = (data['rect'].x + x, data['rect'].y + y)
+
+    @property
+    def count(self):
+        return len(self.ids) - 1
+
+    def land(self, aims, spread, rng):
+        # Component ID under each click aimed at aims, 0 where it missed every component
+        points = self.aim_points[aims] + rng.normal(0.0, spread, aims.shape + (2,))
+        x = np.rint(points[..., 0]).astype(np.intp)
+        y = np.rint(points[..., 1]).astype(np.intp)
+        height, width = self.pick.shape
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        return np.where(inside, self.pick[np.clip(y, 0, height - 1), np.clip(x, 0, width - 1)], 0)
+
+
+def simulate_batch(model, players, questions, recognition, spread, rng):
+    # Returns (score per player, aimed and answered component per click, background clicks)
+    count = model.count
+
+    # Every round asks distinct components in random order
+    asked = np.argsort(rng.random((players, count)), axis=1)[:, :questions] + 1
+    recognised = rng.random(asked.shape) < recognition
+    aims = np.where(recognised, asked, rng.integers(1, count + 1, asked.shape))
+
+    answers = model.land(aims, spread, rng)
+    background_clicks = 0
+    for _ in range(MAX_RETRIES):
+        missed = answers == 0
+        misses = int(missed.sum())
+        if not misses:
+            break
+        background_clicks += misses
+        answers[missed] = model.land(aims[missed], spread, rng)
+
+    scores = (answers == asked).sum(axis=1)
+    return scores, aims, answers, background_clicks
+
+
+def simulate(model, players, questions, recognition, spread, seed):
+    rng = np.random.default_rng(seed)
+    size = model.count + 1
+    score_counts = np.zeros(questions + 1, dtype=np.int64)
+    landings = np.zeros((size, size), dtype=np.int64)  # Aimed component x answered component
+    background_clicks = 0
+    for start in range(0, players, BATCH_PLAYERS):
+        batch = min(BATCH_PLAYERS, players - start)
+        scores, aims, answers, misses = simulate_batch(model, batch, questions, recognition, spread, rng)
+        score_counts += np.bincount(scores, minlength=questions + 1)
+        landings += np.bincount((aims * size + answers).ravel(), minlength=size * size).reshape(size, size)
+        background_clicks += misses
+    return score_counts, landings, background_clicks
+
+
+def report(model, difficulty, players, questions, score_counts, landings, background_clicks, seconds):
+    scores = np.arange(questions + 1)
+    mean = (score_counts * scores).sum() / players
+    deviation = np.sqrt((score_counts * (scores - mean) ** 2).sum() / players)
+    pass_rates = score_counts[::-1].cumsum()[::-1] / players  # P(score >= k)
+    # The game's win rule: two thirds of the questions right
+    threshold = -(-questions * 2 // 3)
+
+    print(f"{difficulty}: {players:,} players, {questions} questions each, simulated in {seconds:.2f} s")
+    print(f"  expected score {mean:.2f}/{questions} (sd {deviation:.2f}), "
+          f"pass rate {pass_rates[threshold]:.1%} at {threshold}/{questions}")
+    print("  pass rate by threshold  " + "  ".join(f"{k}: {pass_rates[k]:.1%}" for k in range(1, questions + 1)))
+    print(f"  background clicks       {background_clicks / (players * questions):.3f} per answer")
+
+    # Misclicks between neighbours: of the clicks aimed at one component, the share landing on another
+    aimed = landings[1:, 1:]
+    rates = aimed / np.maximum(aimed.sum(axis=1, keepdims=True), 1)
+    np.fill_diagonal(rates, 0)
+    worst = np.argsort(rates, axis=None)[::-1][:5]
+    print("  most likely misclicks")
+    for target, landed in zip(*np.unravel_index(worst, rates.shape)):
+        if rates[target, landed] > 0:
+            print(f"    aiming at {model.names[target + 1]}, hitting {model.names[landed + 1]}: "
+                  f"{rates[target, landed]:.3%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo difficulty analysis over the component masks")
+    parser.add_argument('--players', type=int, default=1_000_000, help="players to simulate per difficulty")
+    parser.add_argument('--difficulty', choices=PLAYER_MODELS, help="only simulate this difficulty")
+    parser.add_argument('--questions', type=int, default=QUESTIONS_PER_ROUND, help="questions per round")
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help="bay to analyse")
+    parser.add_argument('--bundle', default=BUNDLE_PATH, help="compiled bundle for the bay, if any")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    model = MaskModel(QuizCatalog(args.manifest, args.bundle))
+    questions = min(args.questions, model.count)
+    for difficulty in [args.difficulty] if args.difficulty else PLAYER_MODELS:
+        player = PLAYER_MODELS[difficulty]
+        start = time.perf_counter()
+        results = simulate(model, args.players, questions, player['recognition'], player['click_spread'], args.seed)
+        report(model, difficulty, args.players, questions, *results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
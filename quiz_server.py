@@ -0,0 +1,232 @@
+# Headless quiz server: hosts many players' quiz sessions in one process, without a window.
+# Each TCP connection is one session speaking newline-delimited JSON:
+#   -> {"click": [x, y]}   logical screen position of a click
+#   -> {"restart": true}   start a new round once the last one is over
+#   -> {"state": true}     current state, e.g. to fetch the next question after an answer
+#   -> {"stats": true}     server counters, used by benchmarks/sessions.py
+#   <- the session state after every request, plus the answer for clicks
+# Hit-testing for every session is served from one shared, read-only pick buffer.
+# Run from the repository root: python quiz_server.py --port 8765
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")  # Let SIGTERM and Ctrl-C stop the server
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import signal
+import time
+import uuid
+
+import pygame
+
+from analytics import AnalyticsRecorder
+from under_the_hood_challenge import (MANIFEST_PATH, BUNDLE_PATH, SCREEN_WIDTH, ENGINE_TOP, GAME_PLAYING, GAME_WON,
+                                      GAME_LOST, PickBuffer, QuizSession, load_manifest, load_asset_bundle,
+                                      decode_image, make_placeholder)
+
+ANSWER_DELAY = 800  # Milliseconds between an answer and the next question, as in the game
+STATE_NAMES = {GAME_PLAYING: 'playing', GAME_WON: 'won', GAME_LOST: 'lost'}
+
+
+def parse_click(value):
+    # Integer (x, y) from a request's [x, y], fractions truncated; None unless it is two numbers
+    if not isinstance(value, list) or len(value) != 2:
+        return None
+    for number in value:
+        if isinstance(number, bool) or not isinstance(number, (int, float)):
+            return None
+        if isinstance(number, float) and not math.isfinite(number):
+            return None
+    return int(value[0]), int(value[1])
+
+
+class QuizCatalog:
+    """Component names and hit-test data, loaded once and shared read-only by every session."""
+
+    def __init__(self, manifest_path=MANIFEST_PATH, bundle_path=BUNDLE_PATH):
+        manifest = load_manifest(manifest_path)
+        bundle = load_asset_bundle(bundle_path, manifest_path)
+        self.components = {}
+        for entry in manifest['components']:
+            mask = self.load_mask(entry, bundle)
+            self.components[entry['key']] = {
+                'name': entry['name'],
+                'rect': mask.get_rect(center=tuple(entry['position'])),
+                'mask': mask,
+            }
+        self.names = {key: data['name'] for key, data in self.components.items()}
+
+        engine_size = tuple(manifest['background']['size'])
+        self.engine_origin = ((SCREEN_WIDTH - engine_size[0]) // 2, ENGINE_TOP)
+        self.pick_buffer = PickBuffer(engine_size, self.components)
+        self.pick_buffer.freeze()
+
+    @staticmethod
+    def load_mask(entry, bundle):
+        # Same sources as the game, in the same order: bundle, loose image, placeholder
+        if bundle is not None and entry['key'] in bundle['sprites']:
+            return bundle['sprites'][entry['key']][1]
+        try:
+            return decode_image(entry['image'], tuple(entry['size']))[1]
+        except Exception:
+            return pygame.mask.from_surface(make_placeholder(entry))
+
+    def pick(self, pos):
+        # Component at a logical screen position, or None
+        return self.pick_buffer.pick(pos[0] - self.engine_origin[0], pos[1] - self.engine_origin[1])
+
+
+class SessionManager:
+    """Hosts quiz sessions on one asyncio event loop.
+
+    Sessions are plain QuizSession objects. The pause after an answer is a loop timer rather than
+    a task per session, so an idle session costs nothing but its state.
+    """
+
+    def __init__(self, catalog, answer_delay=ANSWER_DELAY, seed=None, analytics=None):
+        self.catalog = catalog
+        self.answer_delay = answer_delay
+        self.sessions = {}
+        self.question_shown_at = {}  # Session ID -> loop time its current question was sent
+        self.session_ids = itertools.count(1)
+        self.rng = random.Random(seed)  # Seeds each session's own question order
+        self.answers = 0
+        self.analytics = analytics  # Optional AnalyticsRecorder
+        self.run_id = uuid.uuid4().hex  # Prefix that keeps session IDs unique across server runs
+
+    def open_session(self):
+        session_id = next(self.session_ids)
+        self.sessions[session_id] = QuizSession(self.catalog.names, random.Random(self.rng.getrandbits(64)))
+        self.question_shown_at[session_id] = asyncio.get_running_loop().time()
+        return session_id
+
+    def close_session(self, session_id):
+        self.sessions.pop(session_id, None)
+        self.question_shown_at.pop(session_id, None)
+
+    def click(self, session_id, pos):
+        # Returns the component hit and whether it was the right answer (None if ignored)
+        session = self.sessions[session_id]
+        asked = session.current_question
+        component = self.catalog.pick(pos)
+        correct = None if component is None else session.answer(component)
+        if correct is not None:
+            self.answers += 1
+            loop = asyncio.get_running_loop()
+            loop.call_later(self.answer_delay / 1000, self.advance, session_id)
+            if self.analytics is not None:
+                response_ms = (loop.time() - self.question_shown_at[session_id]) * 1000
+                self.analytics.record(f"{self.run_id}-{session_id}", asked, component, response_ms, "normal")
+        return component, correct
+
+    def advance(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is not None:  # The player may have disconnected in the meantime
+            session.advance()
+            self.question_shown_at[session_id] = asyncio.get_running_loop().time()
+
+    def restart(self, session_id):
+        session = self.sessions[session_id]
+        if session.game_state != GAME_PLAYING:
+            session.restart()
+            self.question_shown_at[session_id] = asyncio.get_running_loop().time()
+
+    def describe(self, session_id):
+        session = self.sessions[session_id]
+        return {
+            'state': STATE_NAMES[session.game_state],
+            'question': session.current_question if session.game_state == GAME_PLAYING else None,
+            'feedback': session.feedback_text,
+            'score': [session.correct_answers, session.total_questions],
+            'awaiting_next_question': session.awaiting_next_question,
+        }
+
+    def handle_request(self, session_id, request):
+        if 'click' in request:
+            pos = parse_click(request['click'])
+            if pos is None:
+                return {'error': "click expects [x, y] as two numbers"}
+            component, correct = self.click(session_id, pos)
+            reply = self.describe(session_id)
+            reply.update(picked=component, correct=correct)
+            return reply
+        if request.get('restart'):
+            self.restart(session_id)
+            return self.describe(session_id)
+        if request.get('state'):
+            return self.describe(session_id)
+        if request.get('stats'):
+            return {'sessions': len(self.sessions), 'answers': self.answers, 'cpu_seconds': time.process_time()}
+        return {'error': "expected click, restart, state or stats"}
+
+    async def handle_connection(self, reader, writer):
+        session_id = self.open_session()
+        try:
+            writer.write(json.dumps(self.describe(session_id)).encode() + b"\n")
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than the stream limit (64 KiB); the rest of it can't be told from new requests
+                    writer.write(json.dumps({'error': "request too long"}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    reply = self.handle_request(session_id, json.loads(line))
+                except (ValueError, TypeError, IndexError, AttributeError):
+                    reply = {'error': "malformed request"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # Player disconnected, or the server is shutting down
+        finally:
+            self.close_session(session_id)
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving quiz sessions on {host}:{port}", flush=True)
+
+        # Stop on Ctrl-C or SIGTERM; open sessions are then cancelled and closed by asyncio.run
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        try:
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signal_number, stopped.set_result, None)
+        except NotImplementedError:
+            pass  # Windows: Ctrl-C still raises KeyboardInterrupt
+        async with server:
+            await stopped
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless Under the Hood Challenge quiz server")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on, 0 picks a free one")
+    parser.add_argument('--answer-delay', type=int, default=ANSWER_DELAY,
+                        help="milliseconds between an answer and the next question")
+    parser.add_argument('--seed', type=int, help="seed for reproducible question orders")
+    parser.add_argument('--analytics', metavar='PATH', help="SQLite file to log every answer to")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    analytics = AnalyticsRecorder(args.analytics) if args.analytics else None
+    manager = SessionManager(QuizCatalog(), answer_delay=args.answer_delay, seed=args.seed, analytics=analytics)
+    try:
+        asyncio.run(manager.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if analytics is not None:
+            analytics.close()  # Write out the last batch
@@ -1,15 +1,48 @@
+import time
+
+STARTUP_TIME = time.perf_counter()  # Taken before importing pygame, which is part of cold start
+
 import pygame
+import os
 import sys
+import json
+import mmap
 import random
+import heapq
+import struct
+import hashlib
+import argparse
+import uuid
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from pygame.locals import *
 
-# Initialize Pygame
-pygame.init()
+from analytics import AnalyticsRecorder, ANALYTICS_PATH
+
+IMPORTS_DONE = time.perf_counter()
+
+# Audio: a small mixer buffer keeps the delay between a click and its sound short
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = 256  # Samples per mixer callback, about 6 ms at 44.1 kHz
+SOUND_CUES = (
+    ('correct', "correct.wav"),
+    ('wrong', "wrong.wav"),
+    ('win', "win.wav"),
+    ('lose', "lose.wav"),
+)
+
+# Mixer settings only take effect when given before the mixer is opened, see AudioManager.start()
+pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, 2, AUDIO_BUFFER)
 
 # Constants
-SCREEN_WIDTH = 800
+SCREEN_WIDTH = 800  # Logical screen size, all layout and picking use these coordinates
 SCREEN_HEIGHT = 600
+ENGINE_TOP = 80  # Logical y of the engine area
 FPS = 60
+SIMULATION_STEP = 10  # Milliseconds of game time per fixed simulation step
+MAX_CATCH_UP = 1000  # Most real time caught up in one frame after a stall, in milliseconds
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GRAY = (200, 200, 200)
@@ -19,528 +52,2003 @@ BLUE = (0, 120, 255)
 YELLOW = (255, 255, 0)
 HIGHLIGHT_COLOR = (255, 165, 0)  # Orange highlight for hover
 
+# Resolved system font files, so later launches skip SysFont's scan of the font directories.
+# Delete the file to pick up newly installed fonts.
+FONT_CACHE_PATH = "font_cache.json"
+
+# Component catalog and background asset loading
+MANIFEST_PATH = "components.json"
+ASSET_WORKERS = 4
+
+# Compiled asset bundle written by compile_assets.py
+BUNDLE_PATH = "assets.bundle"
+BUNDLE_MAGIC = b"UTHB"
+BUNDLE_VERSION = 2
+BUNDLE_HEADER = struct.Struct("<4sII")  # Magic, version, index length
+
+# Question bank: engine bays played one round each, the next one prepared in the background
+BANK_PATH = "bank.json"
+BAY_CACHE_BYTES = 64 * 1024 * 1024  # Memory for prepared bays kept around for later rounds
+BAY_PREFETCH_DELAY = 500  # Game milliseconds after a bay switch before the next bay starts loading
+QUESTIONS_PER_ROUND = 6
+QUESTION_TIME_LIMIT = 10  # Seconds to answer each question in hard mode
+
+# Session recordings: events handle_events() reacts to, and the attributes it reads from them
+RECORDING_VERSION = 2
+RECORDED_EVENTS = (QUIT, KEYDOWN, VIDEOEXPOSE, WINDOWEXPOSED, MOUSEMOTION, MOUSEBUTTONDOWN)
+RECORDED_ATTRIBUTES = ('key', 'mod', 'unicode', 'scancode', 'pos', 'rel', 'buttons', 'button')
+
 # Game states
 GAME_PLAYING = 0
 GAME_WON = 1
 GAME_LOST = 2
 
+# Render modes
+RENDER_FULL_FLIP = 0  # Redraw and flip the whole screen every frame
+RENDER_DIRTY_RECTS = 1  # Redraw only on change and push just the changed regions
+
+# Overlays composited over the static layer, in drawing order, with the frame state slots
+# each one depends on (see fill_frame_state)
+OVERLAY_SLOTS = (
+    ('hover', (0,)),
+    ('tooltip', (1,)),
+    ('popup', (2,)),
+    ('score', (3, 4)),
+    ('timer', (9,)),
+    ('feedback', (5, 6, 7)),
+    ('result', (3, 4, 7)),
+    ('profiler', (8,)),
+)
+FRAME_STATE_SLOTS = 10
+OVERLAY_CACHE_SIZE = 64
+
+# Main loop modes
+LOOP_CONTINUOUS = 0  # Run a frame every 1/FPS seconds
+LOOP_POWER_SAVE = 1  # Sleep until input arrives or a timer is due
+ASSET_POLL_INTERVAL = 50  # Milliseconds between checks for background loads while sleeping
+
+
+def get_ticks():
+    # Milliseconds since startup; unlike pygame.time.get_ticks() this works without pygame.init()
+    return int((time.perf_counter() - STARTUP_TIME) * 1000)
+
+
+def load_font_cache(path):
+    # "name:style" -> [font file, or None for pygame's default font, whether to embolden it]
+    try:
+        with open(path, encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_font_cache(path, cache):
+    try:
+        with open(path, "w", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file, indent=2)
+    except OSError as error:
+        print(f"Warning: could not write {path} ({error}). Fonts will be looked up again next time.")
+
+
+def load_manifest(path):
+    # Catalog of the engine background and every component: image, name, position, size, fallback look
+    with open(path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def decode_image(path, size):
+    # Runs on an asset worker thread: decode, scale and build the hit-test mask
+    img = pygame.image.load(path)
+    img = pygame.transform.scale(img, size)
+    return img, pygame.mask.from_surface(img)
+
+
+def sources_digest(manifest_path):
+    # Hash of the manifest and every image it lists, so a bundle goes stale when any of them change
+    with open(manifest_path, "rb") as manifest_file:
+        manifest_bytes = manifest_file.read()
+    digest = hashlib.sha256(manifest_bytes)
+    manifest = json.loads(manifest_bytes)
+    for entry in [manifest['background']] + manifest['components']:
+        digest.update(entry['image'].encode("utf-8") + b"\0")
+        try:
+            with open(entry['image'], "rb") as image_file:
+                digest.update(hashlib.sha256(image_file.read()).digest())
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def mask_layout():
+    # Masks are copied as raw words, so the bundle is only usable on a matching platform
+    return [memoryview(pygame.mask.Mask((1, 1))).itemsize, sys.byteorder]
+
+
+def load_asset_bundle(path, manifest_path):
+    # Map the compiled bundle and build surfaces directly on top of the mapped pixel data.
+    # Returns None when there is no usable bundle, so the loose PNGs are loaded instead.
+    damaged = f"Warning: {path} is damaged or incomplete, run compile_assets.py. Loading individual images."
+    try:
+        bundle_file = open(path, "rb")
+    except OSError:
+        return None
+    with bundle_file:
+        try:
+            # Copy-on-write mapping: pages are shared with the file and never copied unless written
+            data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):  # ValueError: an empty file can't be mapped
+            print(damaged)
+            return None
+
+    try:
+        magic, version, index_length = BUNDLE_HEADER.unpack_from(data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            print(f"Warning: {path} has an unsupported format. Loading individual images.")
+            return None
+        index = json.loads(data[BUNDLE_HEADER.size:BUNDLE_HEADER.size + index_length])
+        digest = index['sources_sha256']
+
+        # A truncated file still maps fine: every block the index points at must lie within it
+        block_ends = [block['offset'] + block['size'][0] * block['size'][1] * 4
+                      for block in (index['background'], index['atlas']) if block]
+        block_ends += [sprite['mask_offset'] + sprite['mask_size'] for sprite in index['sprites'].values()]
+        complete = BUNDLE_HEADER.size + index_length <= len(data) and max(block_ends, default=0) <= len(data)
+    except (struct.error, ValueError, KeyError, TypeError, IndexError):
+        complete = False
+    if not complete:
+        print(damaged)
+        return None
+    if digest != sources_digest(manifest_path):
+        print(f"Warning: {path} is out of date, run compile_assets.py. Loading individual images.")
+        return None
+
+    view = memoryview(data)
+
+    def surface_at(block):
+        width, height = block['size']
+        pixels = view[block['offset']:block['offset'] + width * height * 4]
+        return pygame.image.frombuffer(pixels, (width, height), "BGRA")  # Display pixel format
+
+    sprites = {}
+    if index['atlas']:
+        atlas = surface_at(index['atlas'])
+        same_mask_layout = index.get('mask_layout') == mask_layout()
+        for key, sprite in index['sprites'].items():
+            img = atlas.subsurface(sprite['rect'])
+            if same_mask_layout:
+                mask = pygame.mask.Mask(img.get_size())
+                mask_start = sprite['mask_offset']
+                memoryview(mask).cast('B')[:] = view[mask_start:mask_start + sprite['mask_size']]
+            else:
+                mask = pygame.mask.from_surface(img)
+            sprites[key] = (img, mask)
+
+    return {
+        'data': data,
+        # Opaque, but stored with the atlas's alpha channel: convert() it before drawing it every frame
+        'background': surface_at(index['background']) if index['background'] else None,
+        'sprites': sprites,
+    }
+
+
+def load_bank(path):
+    # Bays in the order they are played; without a bank file the bay in components.json is the only one
+    try:
+        with open(path, encoding="utf-8") as bank_file:
+            return json.load(bank_file)['bays']
+    except FileNotFoundError:
+        return [{'manifest': MANIFEST_PATH, 'bundle': BUNDLE_PATH}]
+
+
+def prepare_bay(bay, font=None):
+    # Runs on the bay loader thread: decode everything one bay needs and index it for picking.
+    # Decoded surfaces are listed in 'unconverted' for QuestionBank to convert on the main thread.
+    # Given the game font, the labels and questions are rendered here too, off the switch frame.
+    manifest = load_manifest(bay['manifest'])
+    bundle = load_asset_bundle(bay['bundle'], bay['manifest']) if bay.get('bundle') else None
+    sprites = bundle['sprites'] if bundle is not None else {}
+    unconverted = []  # Component keys, or None for the engine background
+
+    background = manifest['background']
+    size = tuple(background['size'])
+    if bundle is not None and bundle['background'] is not None:
+        engine_background = bundle['background']
+    else:
+        try:
+            engine_background = decode_image(background['image'], size)[0]
+        except Exception:
+            print(f"Warning: {background['image']} not found. Using default background.")
+            engine_background = pygame.Surface(size)
+            engine_background.fill(background['color'])
+    unconverted.append(None)
+
+    components = {}
+    for entry in manifest['components']:
+        key = entry['key']
+        if key in sprites:
+            img, mask = sprites[key]
+        else:
+            try:
+                img, mask = decode_image(entry['image'], tuple(entry['size']))
+            except Exception:
+                img = make_placeholder(entry)
+                mask = pygame.mask.from_surface(img)
+            unconverted.append(key)
+        pos = tuple(entry['position'])
+        components[key] = {
+            'image': img,
+            'name': entry['name'],
+            'position': pos,
+            'rect': img.get_rect(center=pos),
+            'mask': mask,
+            'original': img,
+        }
 
-class UnderTheHoodGame:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Under the Hood Challenge")
-        self.clock = pygame.time.Clock()
-        # Use bold fonts for better readability
-        self.font = pygame.font.SysFont('Arial', 24, bold=True)
-        self.small_font = pygame.font.SysFont('Arial', 20)
-        self.large_font = pygame.font.SysFont('Arial', 36, bold=True)
-        self.tooltip_font = pygame.font.SysFont('Arial', 18)
+    # Text surfaces as TextCache would render them: (text, color) -> surface
+    texts = {}
+    if font is not None:
+        for key, data in components.items():
+            texts[(key, WHITE)] = font.render(key, True, WHITE)
+            question = f"Click on: {data['name']}"
+            texts[(question, BLACK)] = font.render(question, True, BLACK)
+
+    # Pixels, masks and pick buffer, roughly what the bay holds in memory
+    pixels = engine_background.get_width() * engine_background.get_height()
+    for data in components.values():
+        pixels += data['rect'].width * data['rect'].height * (1 + 1 / 32)
+    for text in texts.values():
+        pixels += text.get_width() * text.get_height()
+    return {
+        'manifest': manifest,
+        'bundle': bundle,
+        'background': engine_background,
+        'components': components,
+        'pick_buffer': PickBuffer(size, components),
+        'unconverted': unconverted,
+        'font': font,
+        'texts': texts,
+        'bytes': int(pixels * 4) + 2 * size[0] * size[1],
+    }
+
+
+def make_placeholder(entry):
+    # Fallback image for a manifest component whose image isn't available
+    img = pygame.Surface(tuple(entry['size']), pygame.SRCALPHA)
+    img.fill(entry['color'])
+    draw_placeholder(img, entry.get('placeholder'), entry['color'])
+    return img
+
+
+def draw_placeholder(img, style, color):
+    # Draw placeholder details
+    width, height = img.get_size()
+    if style == 'washer_reservoir':
+        pygame.draw.rect(img, WHITE, (width * 0.3, height * 0.2, width * 0.4, height * 0.6))
+    elif style == 'brake_fluid':
+        pygame.draw.rect(img, WHITE, (10, 10, width - 20, height - 20))
+        pygame.draw.circle(img, BLACK, (width // 2, height // 2), min(width, height) // 4)
+    elif style == 'dipstick':
+        pygame.draw.rect(img, color, (width // 2 - 2, 0, 4, height))
+        pygame.draw.circle(img, color, (width // 2, 10), 10)
+    elif style == 'oil_cap':
+        pygame.draw.circle(img, BLACK, (width // 2, height // 2), min(width, height) // 2)
+        pygame.draw.circle(img, WHITE, (width // 2, height // 2), min(width, height) // 2 - 5)
+        pygame.draw.circle(img, BLACK, (width // 2, height // 2), min(width, height) // 2 - 10)
+    elif style == 'coolant':
+        pygame.draw.rect(img, WHITE, (5, 5, width - 10, height - 10))
+        pygame.draw.rect(img, color, (10, 10, width - 20, height - 20))
+    elif style == 'battery':
+        pygame.draw.rect(img, BLACK, (5, 5, width - 10, height - 10))
+        pygame.draw.circle(img, RED, (int(width * 0.3), 10), 5)
+        pygame.draw.circle(img, BLUE, (int(width * 0.7), 10), 5)
+
+
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces.
+
+    Surfaces are shared between callers, so they must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, font, text, antialias, color, surface):
+        # Seed the cache with a surface rendered elsewhere, e.g. on the bay loader thread
+        key = (font, text, antialias, tuple(color))
+        self.surfaces[key] = surface
+        self.surfaces.move_to_end(key)
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)  # Evict the least recently used entry
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class Scheduler:
+    """Runs deferred callbacks from the game loop once their due time has passed.
+
+    Times are in milliseconds from time_source, get_ticks() by default.
+    """
+
+    def __init__(self, time_source=get_ticks):
+        self.time_source = time_source
+        self.queue = []
+        self.counter = 0  # Keeps callbacks due at the same time in scheduling order
+
+    def schedule(self, delay_ms, callback):
+        due = self.time_source() + delay_ms
+        heapq.heappush(self.queue, (due, self.counter, callback))
+        self.counter += 1
+        return due
+
+    def next_due(self):
+        return self.queue[0][0] if self.queue else None
+
+    def run_due(self):
+        # Only read the clock when something is queued, so idle frames stay allocation free
+        if not self.queue:
+            return
+        now = self.time_source()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, callback = heapq.heappop(self.queue)
+            callback()
 
-        # Load component images
-        self.components = {}
-        self.load_component_images()
+    def cancel_all(self):
+        self.queue.clear()
+
+
+class SimulationClock:
+    """Game time that moves in fixed steps of step_ms, independent of how long frames take.
+
+    advance() reads the real time from time_source and returns how many steps are due, which the
+    caller runs one step() at a time. After a stall at most max_catch_up milliseconds are caught
+    up and the rest is skipped, so one slow frame can't snowball into more slow frames.
+    """
+
+    def __init__(self, time_source=get_ticks, step_ms=SIMULATION_STEP, max_catch_up=MAX_CATCH_UP):
+        self.step_ms = step_ms
+        self.max_steps = max_catch_up // step_ms
+        self.now = 0  # Game time in milliseconds, always a whole number of steps
+        self.set_time_source(time_source)
+
+    def __call__(self):
+        return self.now
+
+    def set_time_source(self, time_source):
+        # Continue from the current game time on another real time clock, e.g. a simulated one
+        self.time_source = time_source
+        self.origin = time_source() - self.now  # Real time at game time 0, plus any skipped time
+
+    def advance(self):
+        steps = int(self.time_source() - self.origin - self.now) // self.step_ms
+        if steps > self.max_steps:
+            self.origin += (steps - self.max_steps) * self.step_ms
+            steps = self.max_steps
+        return steps
+
+    def step(self):
+        self.now += self.step_ms
+
+
+class FrameClock:
+    """Real time in milliseconds since the clock was created that only moves between frames.
 
-        # Try to load the real engine bay background
+    Used as the SimulationClock's time source while recording, so the time recorded for a frame
+    is enough to replay how many steps it ran. advance() follows get_ticks(), or jumps to a
+    recorded time during replay.
+    """
+
+    def __init__(self):
+        self.start = get_ticks()
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, now=None):
+        self.now = get_ticks() - self.start if now is None else now
+
+
+class FrameProfiler:
+    """Optional timing of frame phases and named sections.
+
+    Sections are recorded with the monotonic high-resolution clock and can be exported in the
+    Chrome trace event format, which chrome://tracing and Perfetto load directly. When disabled,
+    section() returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled=False, history=600, max_events=200000):
+        self.enabled = enabled
+        self.origin_ns = time.perf_counter_ns()
+        self.events = deque(maxlen=max_events)  # (name, start ns, duration ns)
+        self.frame_times = deque(maxlen=history)  # Milliseconds of work per frame
+        # Change in allocated memory blocks per frame. This is net of frees, so a frame that allocates
+        # and frees the same amount shows 0; benchmarks/allocations.py counts what is allocated.
+        self.frame_net_blocks = deque(maxlen=history)
+        self.frame_start = 0
+        self.frame_blocks = 0
+        self.hud_lines = ()
+        self.hud_refreshed = 0
+        self.null_section = nullcontext()
+
+    def section(self, name):
+        return self.timed(name) if self.enabled else self.null_section
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter_ns()
         try:
-            self.engine_background = pygame.image.load("engine_bay.png")
-            self.engine_background = pygame.transform.scale(self.engine_background, (700, 450))
-        except:
-            # Create a fallback engine background if image isn't available
-            self.engine_background = pygame.Surface((700, 450))
-            self.engine_background.fill((50, 50, 50))  # Dark gray background
-            print("Warning: engine_bay.png not found. Using default background.")
-
-        # Load sound effects (optional)
+            yield
+        finally:
+            self.events.append((name, start, time.perf_counter_ns() - start))
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_blocks = sys.getallocatedblocks()
+            self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self, clock):
+        if not self.enabled:
+            return
+        end = time.perf_counter_ns()
+        self.events.append(('frame', self.frame_start, end - self.frame_start))
+        self.frame_times.append((end - self.frame_start) / 1e6)
+        self.frame_net_blocks.append(sys.getallocatedblocks() - self.frame_blocks)
+
+        # Refresh the HUD text twice a second so it stays readable and doesn't force redraws
+        if end - self.hud_refreshed >= 500_000_000:
+            self.hud_refreshed = end
+            times = sorted(self.frame_times)
+            p50 = times[len(times) // 2]
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+            net_blocks = sum(self.frame_net_blocks) / len(self.frame_net_blocks)
+            self.hud_lines = (
+                f"FPS {clock.get_fps():.1f}",
+                f"frame p50 {p50:.2f} ms  p99 {p99:.2f} ms",
+                f"net blocks {net_blocks:+.1f}/frame",
+            )
+
+    def export_trace(self, path):
+        trace_events = [{
+            'name': name,
+            'ph': 'X',  # Complete event, nested sections show up as a call stack
+            'ts': (start - self.origin_ns) / 1000,
+            'dur': duration / 1000,
+            'pid': 1,
+            'tid': 1,
+        } for name, start, duration in self.events]
+        with open(path, 'w', encoding='utf-8') as trace_file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, trace_file)
+
+
+class StartupTimer:
+    """Where startup time goes: how long each setup phase took, and when the first frame was shown
+    and setup finished, in milliseconds since the game module started loading."""
+
+    def __init__(self):
+        self.phases = [('imports', (IMPORTS_DONE - STARTUP_TIME) * 1000, False)]
+        self.first_frame = None
+        self.ready = None
+
+    def elapsed(self):
+        return (time.perf_counter() - STARTUP_TIME) * 1000
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        yield
+        self.phases.append((name, (time.perf_counter() - start) * 1000, self.first_frame is not None))
+
+    def report(self):
+        print("Startup:")
+        for name, ms, deferred in self.phases:
+            print(f"  {name:<18} {ms:7.1f} ms{'  (after the first frame)' if deferred else ''}")
+        print(f"  first frame shown at {self.first_frame:.1f} ms, setup finished at {self.ready:.1f} ms")
+
+
+class PickBuffer:
+    """Index of the topmost component at every engine area pixel, for O(1) hit-testing.
+
+    components maps keys to dicts with a 'rect' and 'mask' in engine area coordinates;
+    later components are on top of earlier ones.
+    """
+
+    def __init__(self, size, components):
+        self.width, self.height = size
+        self.components = components
+        self.ids = [None] + list(components)  # Buffer value -> component key, 0 = none
+        self.buffer = array('H', bytes(2 * self.width * self.height))
+        self.update_region(pygame.Rect(0, 0, self.width, self.height))
+
+    def update_region(self, region):
+        # Repaint the buffer inside region. Each mask is stamped in C onto a scratch surface with its
+        # ID as the colour (low byte red, high byte green), then the rows are copied into the buffer;
+        # a per-pixel loop would hold the GIL long enough to stall the game loop from a bay loader.
+        region = region.clip(pygame.Rect(0, 0, self.width, self.height))
+        if not region.width or not region.height:
+            return
+        scratch = pygame.Surface(region.size, 0, 32)
+        for index, component in enumerate(self.ids[1:], start=1):
+            data = self.components[component]
+            if data['rect'].colliderect(region):
+                color = (index & 0xFF, index >> 8, 0) if sys.byteorder == 'little' else (index >> 8, index & 0xFF, 0)
+                data['mask'].to_surface(scratch, setcolor=color, unsetcolor=None,
+                                        dest=(data['rect'].x - region.x, data['rect'].y - region.y))
+
+        ids = array('H', pygame.image.tobytes(scratch, "RGBA"))[::2]  # Red and green of every pixel
+        buffer = self.buffer
+        for y in range(region.height):
+            row = (region.top + y) * self.width + region.left
+            buffer[row:row + region.width] = ids[y * region.width:(y + 1) * region.width]
+
+    def freeze(self):
+        # Once shared, e.g. between quiz sessions, any further update raises instead of racing
+        self.buffer = memoryview(self.buffer).toreadonly()
+
+    def pick(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.ids[self.buffer[y * self.width + x]]
+        return None
+
+
+class QuestionBank:
+    """Engine bays to play one round each, in turn.
+
+    prefetch() prepares a bay on a worker thread and take() hands it over once it is ready,
+    never waiting for it. Prepared bays stay cached for later rounds as long as they fit in
+    max_bytes, evicting the least recently played first.
+    """
+
+    def __init__(self, bays, max_bytes=BAY_CACHE_BYTES):
+        self.bays = bays  # Dicts with a 'manifest' path and an optional compiled 'bundle' path
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()  # Bay index -> prepared bay, least recently used first
+        self.cached_bytes = 0
+        self.pending = {}  # Bay index -> Future
+        self.failed = set()  # Bays that couldn't be loaded, skipped from then on
+        self.loader = None  # Single worker thread, started on the first prefetch
+
+    def next_index(self, index):
+        # The bay after index that can still be played, wrapping around; index itself if none
+        for step in range(1, len(self.bays)):
+            candidate = (index + step) % len(self.bays)
+            if candidate not in self.failed:
+                return candidate
+        return index
+
+    def prefetch(self, index, font=None):
+        if index in self.cache or index in self.pending or index in self.failed:
+            return
+        if self.loader is None:
+            self.loader = ThreadPoolExecutor(max_workers=1)
+        self.pending[index] = self.loader.submit(prepare_bay, self.bays[index], font)
+
+    def take(self, index, wait=False):
+        # The prepared bay, or None while it is still loading (unless wait) or if it can't be loaded
+        bay = self.cache.get(index)
+        if bay is not None:
+            self.cache.move_to_end(index)
+            return bay
+        if wait:
+            self.prefetch(index)
+        future = self.pending.get(index)
+        if future is None or not (wait or future.done()):
+            return None
+        del self.pending[index]
         try:
-            self.correct_sound = pygame.mixer.Sound("correct.wav")
-            self.wrong_sound = pygame.mixer.Sound("wrong.wav")
-            self.win_sound = pygame.mixer.Sound("win.wav")
-            self.lose_sound = pygame.mixer.Sound("lose.wav")
-            self.sounds_loaded = True
-        except:
-            self.sounds_loaded = False
-            print("Warning: Sound files not found. Continuing without sound.")
-
-        # Game state variables
-        self.game_state = GAME_PLAYING
-        self.current_question = None
-        self.correct_answers = 0
-        self.total_questions = 0
-        self.max_questions = 6
-        self.feedback_text = "Identify the car components!"
-        self.feedback_color = BLACK
-        self.hovered_component = None
-        self.popup = None
-        self.popup_timer = 0
-        self.tooltip = None
+            bay = future.result()
+        except Exception as error:
+            print(f"Warning: could not load {self.bays[index]['manifest']} ({error}). Skipping this bay.")
+            self.failed.add(index)
+            return None
+
+        # Display format conversion has to happen on the main thread, once per bay
+        components = bay['components']
+        for key in bay.pop('unconverted'):
+            if key is None:
+                bay['background'] = bay['background'].convert()
+            else:
+                img = components[key]['image'].convert_alpha()
+                components[key].update(image=img, original=img)
 
-        # Add difficulty levels
-        self.difficulty = "normal"  # Options: "easy", "normal", "hard"
-        self.time_per_question = 10  # Seconds per question (only used in hard mode)
-        self.question_timer = 0
-        self.show_labels = True  # Whether to show labels (hidden in hard mode)
+        self.cache[index] = bay
+        self.cached_bytes += bay['bytes']
+        while self.cached_bytes > self.max_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted['bytes']
+        return bay
 
-        # Component descriptions for tooltips
-        self.component_descriptions = {
-            'A': "Holds fluid for cleaning your windshield. Check and refill regularly.",
-            'B': "Stores brake fluid for the hydraulic braking system. Critical for safe braking.",
-            'C': "Measures oil level in the engine. Check when engine is cool and on level ground.",
-            'D': "Where you add oil to the engine. Use manufacturer recommended oil type.",
-            'E': "Contains coolant mixture that regulates engine temperature. Check when engine is cool.",
-            'F': "Provides electrical power to start the engine and run accessories. Check terminals for corrosion."
-        }
+    def shutdown(self):
+        if self.loader is not None:
+            self.loader.shutdown(wait=False, cancel_futures=True)
+            self.loader = None
 
-        # Generate a list of components to ask about
-        self.component_queue = list(self.components.keys())
-        random.shuffle(self.component_queue)
 
-        # Set the first question
-        self.set_next_question()
+class QuizSession:
+    """Quiz state for one player: question order, scoring and feedback, with no rendering,
+    sound or timers.
 
-    def load_component_images(self):
-        # Component config: key, image path, display name, position, custom size
-        component_data = [
-            ('A', "washer_reservoir.png", "Windshield Washer Reservoir", (100, 120), (360, 60)),
-            ('B', "brake_fluid.png", "Brake Fluid Reservoir", (50, 300), (70, 50)),
-            ('C', "oil_dipstick.png", "Oil Dipstick", (250, 350), (20, 80)),
-            ('D', "oil_cap.png", "Oil Cap", (300, 150), (50, 50)),
-            ('E', "coolant_reservoir.png", "Coolant Reservoir", (450, 120), (70, 60)),
-            ('F', "battery.png", "Battery", (550, 150), (90, 50))
-        ]
+    answer() records a pick and returns whether it was correct, or None when the answer is
+    ignored. The caller shows the feedback and calls advance() when the next question is due.
+    """
 
-        # Fallback colors
-        colors = {
-            'A': (0, 162, 232),  # Blue - Washer Reservoir
-            'B': (128, 128, 128),  # Gray - Brake Fluid
-            'C': (255, 201, 14),  # Yellow - Oil Dipstick
-            'D': (0, 0, 0),  # Black - Oil Cap
-            'E': (255, 242, 0),  # Yellow - Coolant Reservoir
-            'F': (50, 50, 50)  # Dark Gray - Battery
-        }
+    def __init__(self, names, rng=random, max_questions=QUESTIONS_PER_ROUND):
+        self.names = names  # Component key -> display name
+        self.rng = rng
+        self.max_questions = min(len(names), max_questions)
+        self.restart()
 
-        for key, img_path, name, pos, size in component_data:
-            width, height = size
-            try:
-                img = pygame.image.load(img_path).convert_alpha()
-                img = pygame.transform.scale(img, size)  # Scale to custom size
-            except:
-                # Create fallback placeholder
-                img = pygame.Surface(size, pygame.SRCALPHA)
-                img.fill(colors[key])
-
-                # Draw placeholder details
-                if key == 'A':  # Washer reservoir
-                    pygame.draw.rect(img, WHITE, (width * 0.3, height * 0.2, width * 0.4, height * 0.6))
-                elif key == 'B':  # Brake fluid
-                    pygame.draw.rect(img, WHITE, (10, 10, width - 20, height - 20))
-                    pygame.draw.circle(img, BLACK, (width // 2, height // 2), min(width, height) // 4)
-                elif key == 'C':  # Dipstick
-                    pygame.draw.rect(img, colors[key], (width // 2 - 2, 0, 4, height))
-                    pygame.draw.circle(img, colors[key], (width // 2, 10), 10)
-                elif key == 'D':  # Oil cap
-                    pygame.draw.circle(img, BLACK, (width // 2, height // 2), min(width, height) // 2)
-                    pygame.draw.circle(img, WHITE, (width // 2, height // 2), min(width, height) // 2 - 5)
-                    pygame.draw.circle(img, BLACK, (width // 2, height // 2), min(width, height) // 2 - 10)
-                elif key == 'E':  # Coolant
-                    pygame.draw.rect(img, WHITE, (5, 5, width - 10, height - 10))
-                    pygame.draw.rect(img, colors[key], (10, 10, width - 20, height - 20))
-                elif key == 'F':  # Battery
-                    pygame.draw.rect(img, BLACK, (5, 5, width - 10, height - 10))
-                    pygame.draw.circle(img, RED, (int(width * 0.3), 10), 5)
-                    pygame.draw.circle(img, BLUE, (int(width * 0.7), 10), 5)
-
-            rect = img.get_rect(center=pos)
-            mask = pygame.mask.from_surface(img)
+    def restart(self):
+        self.game_state = GAME_PLAYING
+        self.correct_answers = 0
+        self.total_questions = 0
+        self.feedback_text = "Identify the car components!"
+        self.feedback_color = BLACK
+        self.current_question = None
+        self.awaiting_next_question = False
 
-            self.components[key] = {
-                'image': img,
-                'name': name,
-                'position': pos,
-                'rect': rect,
-                'mask': mask,
-                'original': img.copy()
-            }
+        # Generate a list of components to ask about
+        self.component_queue = list(self.names)
+        self.rng.shuffle(self.component_queue)
+        del self.component_queue[self.max_questions:]  # Bays with more components ask a random few
+        self.next_question()
 
-    def set_next_question(self):
+    def next_question(self):
         if self.component_queue:
             self.current_question = self.component_queue.pop()
-            component_name = self.components[self.current_question]['name']
-            self.feedback_text = f"Click on: {component_name}"
+            self.feedback_text = f"Click on: {self.names[self.current_question]}"
             self.feedback_color = BLACK
         else:
             # All questions asked, evaluate the game result
-            if self.correct_answers >= 4:  # Win condition
+            if self.correct_answers * 3 >= self.max_questions * 2:  # Win condition, 4 out of 6
                 self.game_state = GAME_WON
                 self.feedback_text = "✅ You Win! Press R to play again."
                 self.feedback_color = GREEN
-                if self.sounds_loaded:
-                    self.win_sound.play()
             else:  # Lose condition
                 self.game_state = GAME_LOST
-                self.feedback_text = f"❌ Try Again! Score: {self.correct_answers}/6. Press R to restart."
+                self.feedback_text = (f"❌ Try Again! Score: {self.correct_answers}/{self.max_questions}. "
+                                      "Press R to restart.")
                 self.feedback_color = RED
-                if self.sounds_loaded:
-                    self.lose_sound.play()
 
-    def check_answer(self, selected_component):
-        if self.game_state != GAME_PLAYING:
-            return
+    def answer(self, selected_component):
+        # Ignore further answers while the feedback for the last one is showing
+        if self.game_state != GAME_PLAYING or self.awaiting_next_question:
+            return None
 
         self.total_questions += 1
-        component_name = self.components[selected_component]['name']
-
-        if selected_component == self.current_question:
+        component_name = self.names[selected_component]
+        correct = selected_component == self.current_question
+        if correct:
             self.correct_answers += 1
             self.feedback_text = f"Correct! That was the {component_name}."
             self.feedback_color = GREEN
-            if self.sounds_loaded:
-                self.correct_sound.play()
         else:
             self.feedback_text = f"Wrong! That was the {component_name}."
             self.feedback_color = RED
-            if self.sounds_loaded:
-                self.wrong_sound.play()
+        self.awaiting_next_question = True
+        return correct
 
-        # Set a timer for the popup with enhanced styling
-        self.popup = {
-            'component': selected_component,
-            'position': self.components[selected_component]['position'],
-            'text': component_name,
-            'correct': selected_component == self.current_question
-        }
-        self.popup_timer = 120  # frames to show popup (2 seconds at 60 FPS)
+    def time_out(self):
+        # The countdown ran out on the current question, which counts as a wrong answer
+        self.total_questions += 1
+        self.feedback_text = f"Time's up! It was the {self.names[self.current_question]}."
+        self.feedback_color = RED
+        self.awaiting_next_question = True
 
-        # Wait a moment before setting the next question, shorter delay for better flow
-        pygame.time.delay(800)
-        self.set_next_question()
+    def advance(self):
+        self.awaiting_next_question = False
+        self.next_question()
 
-    def restart_game(self):
-        self.game_state = GAME_PLAYING
-        self.correct_answers = 0
-        self.total_questions = 0
-        self.feedback_text = "Identify the car components!"
-        self.feedback_color = BLACK
-        self.component_queue = list(self.components.keys())
-        random.shuffle(self.component_queue)
-        self.set_next_question()
 
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                pygame.quit()
-                sys.exit()
+class AudioManager:
+    """Sound effects, each cue on its own reserved mixer channel.
 
-            # Handle key presses
-            elif event.type == KEYDOWN:
-                if event.key == K_r and (self.game_state == GAME_WON or self.game_state == GAME_LOST):
-                    self.restart_game()
-                elif event.key == K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
+    Nothing is opened until start(), as opening the audio device can take a while. Sounds are
+    decoded on a worker thread. A cue played before its sound has loaded is skipped rather than
+    waited for. Replaying a cue restarts it on its channel, so different cues never cut each
+    other off and nothing else can take their channels.
+    """
 
-            # Handle mouse events
-            elif event.type == MOUSEBUTTONDOWN and event.button == 1:  # Left mouse button
-                if self.game_state == GAME_PLAYING:
-                    mouse_pos = pygame.mouse.get_pos()
-
-                    # Adjust mouse position for engine area
-                    engine_x = (SCREEN_WIDTH - self.engine_background.get_width()) // 2
-                    engine_y = 80
-                    adjusted_mouse_x = mouse_pos[0] - engine_x
-                    adjusted_mouse_y = mouse_pos[1] - engine_y
-
-                    # Only check for clicks if mouse is within engine boundaries
-                    if (0 <= adjusted_mouse_x < self.engine_background.get_width() and
-                            0 <= adjusted_mouse_y < self.engine_background.get_height()):
-
-                        # Check for click on components using their masks for pixel-perfect detection
-                        for component, data in self.components.items():
-                            comp_rect = data['rect'].copy()
-                            rel_x = adjusted_mouse_x - comp_rect.x
-                            rel_y = adjusted_mouse_y - comp_rect.y
-
-                            if (comp_rect.collidepoint(adjusted_mouse_x, adjusted_mouse_y) and
-                                    0 <= rel_x < comp_rect.width and
-                                    0 <= rel_y < comp_rect.height and
-                                    data['mask'].get_at((rel_x, rel_y))):
-                                self.check_answer(component)
-                                break
+    def __init__(self, cues=SOUND_CUES):
+        self.cues = cues
+        self.sounds = {}
+        self.channels = {}
+        self.pending = {}  # Future -> (cue name, path)
+        self.loader = None
 
-    def update(self):
-        # Update popup timer
-        if self.popup_timer > 0:
-            self.popup_timer -= 1
+    def start(self):
+        cues = self.cues
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            print("Warning: No audio device available. Continuing without sound.")
+            return
+
+        if pygame.mixer.get_num_channels() < len(cues):
+            pygame.mixer.set_num_channels(len(cues))
+        pygame.mixer.set_reserved(len(cues))  # Sound.play() never picks these channels
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        for index, (name, path) in enumerate(cues):
+            self.channels[name] = pygame.mixer.Channel(index)
+            self.pending[self.loader.submit(pygame.mixer.Sound, path)] = (name, path)
+
+    def install_loaded_sounds(self, wait=False):
+        for future in list(self.pending):
+            if not wait and not future.done():
+                continue
+            name, path = self.pending.pop(future)
+            try:
+                self.sounds[name] = future.result()
+            except Exception:
+                print(f"Warning: {path} not found. Continuing without that sound.")
+
+        if not self.pending and self.loader is not None:
+            self.loader.shutdown(wait=False)
+            self.loader = None
+
+    def wait_for_sounds(self):
+        self.install_loaded_sounds(wait=True)
+
+    def play(self, name):
+        if self.pending:
+            self.install_loaded_sounds()
+        sound = self.sounds.get(name)
+        if sound is not None:
+            self.channels[name].play(sound)
+
+
+class InputRecorder:
+    """Writes a session to a JSON lines file that InputReplay can play back.
+
+    The first line holds everything else the session depends on (RNG seed, window size, question
+    bank). Every frame follows as [game time ms] or [game time ms, events], and close() adds the
+    outcome so a replay can check that it ended up in the same state.
+    """
+
+    def __init__(self, path, header):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.write(dict(header, version=RECORDING_VERSION))
+
+    def write(self, item):
+        self.file.write(json.dumps(item, separators=(',', ':')) + "\n")
+
+    def record_frame(self, now, events):
+        recorded = [[event.type, {name: value for name, value in event.dict.items() if name in RECORDED_ATTRIBUTES}]
+                    for event in events if event.type in RECORDED_EVENTS]
+        self.write([now, recorded] if recorded else [now])
+
+    def close(self, outcome):
+        self.write({'end': outcome})
+        self.file.close()
+
+
+class InputReplay:
+    """Plays back a file written by InputRecorder, one recorded frame per game frame."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, encoding='utf-8')
+        self.header = json.loads(self.file.readline())
+        if self.header.get('version') != RECORDING_VERSION:
+            raise SystemExit(f"{path} is not a session recording this version of the game can replay")
+        self.outcome = None  # Recorded final state, read at the end of the file
+        self.frames = 0
+        self.start_time = time.perf_counter()
+
+    def next_frame(self):
+        # (game time, events) of the next frame, or None once the recording is over
+        line = self.file.readline()
+        if not line:
+            return None
+        frame = json.loads(line)
+        if isinstance(frame, dict):
+            self.outcome = frame['end']
+            return None
+        self.frames += 1
+        events = [pygame.event.Event(event_type, {name: tuple(value) if isinstance(value, list) else value
+                                                  for name, value in attributes.items()})
+                  for event_type, attributes in (frame[1] if len(frame) > 1 else ())]
+        return frame[0], events
+
+    def finish(self, outcome):
+        # Report how the replay went; outcome is compared the way it was stored, through JSON.
+        # The recorded quit comes before the recorded outcome, so read up to it first.
+        for line in self.file:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                self.outcome = item['end']
+        self.file.close()
+        wall_time = time.perf_counter() - self.start_time
+        print(f"Replayed {self.frames} frames ({outcome['time'] / 1000:.1f} s of play) in {wall_time:.1f} s")
+        outcome = json.loads(json.dumps(outcome))
+        if self.outcome is None:
+            print(f"Warning: {self.path} has no recorded outcome to compare with, it may be truncated.")
+        elif outcome != self.outcome:
+            print(f"Warning: replay diverged from the recording. Expected {self.outcome}, got {outcome}.")
         else:
-            self.popup = None
+            print("Replay reached the recorded outcome.")
+
+
+class UnderTheHoodGame:
+    def __init__(self, render_mode=RENDER_DIRTY_RECTS, profile=False, trace_path=None, loop_mode=LOOP_CONTINUOUS,
+                 output_size=None, analytics_path=None, bank_path=BANK_PATH, seed=None, startup_report=False):
+        self.startup = StartupTimer()
+        self.startup_report = startup_report  # Print the startup breakdown once setup has finished
+        with self.startup.phase('pygame init'):
+            # Only the modules the game uses; the mixer is opened after the first frame, see below
+            pygame.display.init()
+            pygame.font.init()
+        pygame.display.set_caption("Under the Hood Challenge")
+        self.clock = pygame.time.Clock()
+
+        # Optional frame profiler; F3 toggles its on-screen HUD
+        self.profiler = FrameProfiler(enabled=profile)
+        self.trace_path = trace_path  # Trace file written on quit when profiling
+        self.show_profiler_hud = profile
+        self.text_cache = TextCache()
+        self.tooltip_cache = {}  # Component key -> (font, text, finished tooltip surface)
+        self.font_sets = {}  # Scale factor -> fonts sized for it
+        self.scaled_surfaces = {}  # (source surface, scale factor) -> resampled copy
+        self.font_cache = load_font_cache(FONT_CACHE_PATH)
+        self.font_cache_changed = False
+
+        # The logical screen is drawn straight at the output resolution, see set_output_size
+        self.static_layer = None
+        with self.startup.phase('window and fonts'):
+            self.set_output_size(output_size or (SCREEN_WIDTH, SCREEN_HEIGHT))
+
+        # Question order comes from this RNG; seeded, it makes a session reproducible
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else random
+
+        # Bays to play; later bays are prepared in the background while the current one is played
+        self.bank_path = bank_path
+        self.bank = QuestionBank(load_bank(bank_path))
+        self.bay_index = 0
+
+        # Load the first bay's catalog; images are decoded in the background while placeholders draw
+        bay = self.bank.bays[self.bay_index]
+        self.asset_loader = None  # Thread pool, only started when loose images have to be decoded
+        self.pending_assets = {}  # Future -> component key, or None for the engine background
+        self.components = {}
+        with self.startup.phase('catalog'):
+            self.manifest = load_manifest(bay['manifest'])
+            self.asset_bundle = load_asset_bundle(bay['bundle'], bay['manifest']) if bay.get('bundle') else None
+            self.load_component_images()
+            self.load_engine_background()
+
+        # Component ID per engine area pixel for O(1) hover and click picking
+        self.pick_version = 0  # Bumped whenever the pick buffer changes
+        with self.startup.phase('pick buffer'):
+            self.build_pick_buffer()
+
+        # Sound effects (optional), loaded in the background once started
+        self.audio = AudioManager()
 
-        # Update hovered component and tooltip
-        mouse_pos = pygame.mouse.get_pos()
+        # Game state variables; the quiz itself is tracked by self.session, created below
         self.hovered_component = None
+        self.popup = None
+        self.popup_duration = 2000  # Milliseconds to show the answer popup
+        self.answer_delay = 800  # Milliseconds to show answer feedback before the next question
+        self.game_clock = SimulationClock()  # Game time, stepped from update()
+        self.scheduler = Scheduler(self.game_clock)
         self.tooltip = None
+        self.mouse_pos = pygame.mouse.get_pos()  # Last known mouse position, updated from events
+        # Inputs the current hover result was computed from
+        self.hover_mouse_pos = None
+        self.hover_game_state = None
+        self.hover_pick_version = None
+        self.loop_mode = loop_mode
+
+        # Rendering state for dirty-rect updates
+        self.render_mode = render_mode
+        self.full_redraw = True  # Force a full flip on the next frame
+        # Two preallocated frame state lists, filled in place and swapped every drawn frame
+        self.frame_state = [None] * FRAME_STATE_SLOTS
+        self.last_frame_state = [None] * FRAME_STATE_SLOTS
+        self.dirty_rects = []
+        self.static_layer_key = None  # The static layer itself is built on demand
+        self.overlays = {}  # Overlay name -> (blits, screen rect), composited over the static layer
+        self.overlay_cache = OrderedDict()  # (overlay name, state key) -> (blits, screen rect)
 
-        if self.game_state == GAME_PLAYING:
-            # Adjust mouse position for engine area
-            engine_x = (SCREEN_WIDTH - self.engine_background.get_width()) // 2
-            engine_y = 80
-            adjusted_mouse_x = mouse_pos[0] - engine_x
-            adjusted_mouse_y = mouse_pos[1] - engine_y
-
-            # Only check for hover if mouse is within engine boundaries
-            if (0 <= adjusted_mouse_x < self.engine_background.get_width() and
-                    0 <= adjusted_mouse_y < self.engine_background.get_height()):
-
-                # Check for hover on components using their rects and masks
-                for component, data in self.components.items():
-                    comp_rect = data['rect'].copy()
-                    rel_x = adjusted_mouse_x - comp_rect.x
-                    rel_y = adjusted_mouse_y - comp_rect.y
-
-                    if (comp_rect.collidepoint(adjusted_mouse_x, adjusted_mouse_y) and
-                            0 <= rel_x < comp_rect.width and
-                            0 <= rel_y < comp_rect.height and
-                            data['mask'].get_at((rel_x, rel_y))):
-                        self.hovered_component = component
-
-                        # Create tooltip with component description
-                        if component in self.component_descriptions:
-                            tooltip_text = f"{data['name']}: {self.component_descriptions[component]}"
-                            self.tooltip = {
-                                'text': tooltip_text,
-                                'position': (
-                                    data['position'][0] + engine_x,
-                                    data['position'][1] + engine_y + 50
-                                )
-                            }
-                        break
+        # Add difficulty levels
+        self.difficulty = "normal"  # Options: "easy", "normal", "hard"
+        self.time_per_question = QUESTION_TIME_LIMIT  # Seconds per question (only used in hard mode)
+        self.question_timer = 0  # Milliseconds left on the current question in hard mode
+        self.show_labels = True  # Whether to show labels (hidden in hard mode)
 
-    def draw(self):
-        self.screen.fill(WHITE)
+        # Component descriptions for tooltips
+        self.component_descriptions = {entry['key']: entry['description']
+                                       for entry in self.manifest['components']}
+
+        # Quiz state machine, picks the question order and sets the first question
+        self.session = QuizSession({key: data['name'] for key, data in self.components.items()}, self.rng)
+        self.start_question_timer()
+
+        # Optional answer log, written in the background (see analytics.py)
+        self.analytics = AnalyticsRecorder(analytics_path) if analytics_path else None
+        self.analytics_session = uuid.uuid4().hex
+
+        # Session recording and replay, see start_recording() and start_replay()
+        self.frame_clock = None  # Set while recording or replaying, game time then runs per frame
+        self.recorder = None
+        self.replay = None
+        self.replay_throttled = True
+
+        # Setup that can wait until the first frame is on screen, run one step per frame by run()
+        self.startup_tasks = deque([('audio', self.audio.start), ('bay prefetch', self.prefetch_next_bay)])
+        self.starting_up = True
+
+    def set_output_size(self, size):
+        # Fit the logical screen into the window with one uniform scale, letterboxing any spare room.
+        # Everything is laid out in logical coordinates and drawn at this scale directly, so nothing
+        # has to be resampled per frame.
+        self.screen = pygame.display.set_mode(size)
+        self.screen_rect = self.screen.get_rect()
+        self.full_screen_rects = [self.screen_rect]  # What draw() reports for a full frame
+        self.scale = min(size[0] / SCREEN_WIDTH, size[1] / SCREEN_HEIGHT)
+        self.view_offset = ((size[0] - round(SCREEN_WIDTH * self.scale)) // 2,
+                            (size[1] - round(SCREEN_HEIGHT * self.scale)) // 2)
+        self.view_rect = self.to_screen_rect(pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+
+        # Use bold fonts for better readability, one set per scale factor
+        fonts = self.font_sets.get(self.scale)
+        if fonts is None:
+            fonts = (self.load_font('Arial', self.scale_length(24), bold=True),
+                     self.load_font('Arial', self.scale_length(20)),
+                     self.load_font('Arial', self.scale_length(36), bold=True),
+                     self.load_font('Arial', self.scale_length(18)))
+            self.font_sets[self.scale] = fonts
+            if self.font_cache_changed:
+                save_font_cache(FONT_CACHE_PATH, self.font_cache)
+                self.font_cache_changed = False
+        self.font, self.small_font, self.large_font, self.tooltip_font = fonts
+
+        # Surfaces reused for every label and every result screen instead of allocating new ones
+        self.label_background = pygame.Surface((self.scale_length(30), self.scale_length(30)))
+        self.label_background.fill(BLUE)
+        self.label_background.set_alpha(200)  # Semi-transparent
+        self.result_overlay = pygame.Surface(size, pygame.SRCALPHA)
+        self.result_panel = pygame.Surface((self.scale_length(400), self.scale_length(200)))
+        self.static_layer_surface = pygame.Surface(size).convert()  # Repainted by build_static_layer
+        self.invalidate_static_layer()
+
+    def load_font(self, name, size, bold=False):
+        # The font pygame.font.SysFont would return, with the font file it picks remembered across runs
+        key = f"{name}:{'bold' if bold else 'regular'}"
+        resolved = self.font_cache.get(key)
+        if resolved is None or (resolved[0] is not None and not os.path.exists(resolved[0])):
+            resolved = pygame.font.SysFont(name, size, bold,
+                                           constructor=lambda path, size, embolden, italic: [path, embolden])
+            self.font_cache[key] = resolved
+            self.font_cache_changed = True
+        path, embolden = resolved
+        font = pygame.font.Font(path, size)
+        if embolden:
+            font.set_bold(True)
+        return font
+
+    def scale_length(self, length):
+        # Logical length in output pixels, never rounded down to nothing
+        return max(1, round(length * self.scale))
+
+    def to_screen(self, pos):
+        return (self.view_offset[0] + round(pos[0] * self.scale),
+                self.view_offset[1] + round(pos[1] * self.scale))
+
+    def to_screen_rect(self, rect):
+        left, top = self.to_screen(rect.topleft)
+        right, bottom = self.to_screen(rect.bottomright)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def to_logical(self, screen_pos):
+        # Inverse of to_screen, used to map mouse positions back for picking
+        return (int((screen_pos[0] - self.view_offset[0]) // self.scale),
+                int((screen_pos[1] - self.view_offset[1]) // self.scale))
+
+    def get_engine_origin(self):
+        # Logical top left of the engine area, component positions are relative to it
+        return (SCREEN_WIDTH - self.engine_background.get_width()) // 2, ENGINE_TOP
+
+    def get_scaled_surface(self, surface):
+        # Assets are resampled once per scale factor and reused for every frame at that scale
+        if self.scale == 1:
+            return surface
+        key = (surface, self.scale)
+        scaled = self.scaled_surfaces.get(key)
+        if scaled is None:
+            size = (self.scale_length(surface.get_width()), self.scale_length(surface.get_height()))
+            scaled = pygame.transform.smoothscale(surface, size)
+            self.scaled_surfaces[key] = scaled
+        return scaled
+
+    def discard_scaled_surfaces(self, surface):
+        # Drop the resampled copies of an asset that has been replaced
+        for key in [key for key in self.scaled_surfaces if key[0] is surface]:
+            del self.scaled_surfaces[key]
 
-        # Draw engine background
-        engine_x = (SCREEN_WIDTH - self.engine_background.get_width()) // 2
-        engine_y = 80
-        self.screen.blit(self.engine_background, (engine_x, engine_y))
+    def load_component_images(self):
+        for entry in self.manifest['components']:
+            key = entry['key']
+            size = tuple(entry['size'])
+            pos = tuple(entry['position'])
 
-        # Draw components
-        for component, data in self.components.items():
-            # Prepare the image to draw
-            img_to_draw = data['original'].copy()
-
-            # Apply highlight effect for hovered component
-            if component == self.hovered_component:
-                # Create a highlighted version with a glowing border
-                highlight_surface = pygame.Surface((data['rect'].width + 10, data['rect'].height + 10), pygame.SRCALPHA)
-                highlight_surface.fill((0, 0, 0, 0))  # Transparent background
-
-                # Draw a 5px glowing border
-                pygame.draw.rect(highlight_surface, HIGHLIGHT_COLOR,
-                                 (0, 0, highlight_surface.get_width(), highlight_surface.get_height()),
-                                 5, border_radius=10)
-
-                # Draw the component image in the center of the highlight
-                highlight_surface.blit(img_to_draw, (5, 5))
-
-                # Draw the highlighted version
-                comp_pos = (data['position'][0] - highlight_surface.get_width() // 2 + engine_x,
-                            data['position'][1] - highlight_surface.get_height() // 2 + engine_y)
-                self.screen.blit(highlight_surface, comp_pos)
-            else:
-                # Draw the regular component
-                comp_pos = (data['position'][0] - data['rect'].width // 2 + engine_x,
-                            data['position'][1] - data['rect'].height // 2 + engine_y)
-                self.screen.blit(img_to_draw, comp_pos)
+            # Create fallback placeholder, shown until the real image has been decoded
+            img = make_placeholder(entry)
 
-            # Draw component label if enabled
-            if self.show_labels:
-                label_bg = pygame.Surface((30, 30))
-                label_bg.fill(BLUE)
-                label_bg.set_alpha(200)  # Semi-transparent
-
-                # Position the label near the component
-                label_pos = (data['position'][0] - 15 + engine_x,
-                             data['position'][1] - data['rect'].height // 2 - 25 + engine_y)
-                self.screen.blit(label_bg, label_pos)
-
-                # Draw the label text
-                label = self.font.render(component, True, WHITE)
-                label_rect = label.get_rect(center=(label_pos[0] + 15, label_pos[1] + 15))
-                self.screen.blit(label, label_rect)
-
-        # Draw tooltip if component is being hovered over
-        if self.tooltip:
-            tooltip_text = self.tooltip['text']
-
-            # Wrap text to multiple lines if needed
-            max_width = 400
-            words = tooltip_text.split(' ')
-            lines = []
-            current_line = words[0]
-
-            for word in words[1:]:
-                test_line = current_line + ' ' + word
-                test_width = self.tooltip_font.size(test_line)[0]
-                if test_width < max_width:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word
-            lines.append(current_line)  # Add the last line
+            self.components[key] = {
+                'image': img,
+                'name': entry['name'],
+                'position': pos,
+                'rect': img.get_rect(center=pos),
+                'mask': pygame.mask.from_surface(img),
+                'original': img  # Never drawn on, so it can share the image
+            }
+
+            if self.asset_bundle is None:
+                self.load_in_background(key, entry['image'], size)
+            elif key in self.asset_bundle['sprites']:
+                img, mask = self.asset_bundle['sprites'][key]
+                self.components[key].update(image=img, mask=mask, original=img)
+
+    def load_engine_background(self):
+        background = self.manifest['background']
+
+        # Create a fallback engine background until the real engine bay image is available
+        self.engine_background = pygame.Surface(tuple(background['size']))
+        self.engine_background.fill(background['color'])  # Dark gray background
+
+        if self.asset_bundle is None:
+            self.load_in_background(None, background['image'], tuple(background['size']))
+        elif self.asset_bundle['background'] is not None:
+            self.engine_background = self.asset_bundle['background'].convert()
+        else:
+            print(f"Warning: {background['image']} not found. Using default background.")
+
+    def load_in_background(self, key, image_path, size):
+        if self.asset_loader is None:
+            self.asset_loader = ThreadPoolExecutor(max_workers=ASSET_WORKERS)
+        future = self.asset_loader.submit(decode_image, image_path, size)
+        self.pending_assets[future] = key
+
+    def install_loaded_assets(self, wait=False):
+        # Swap placeholders for images the asset workers have finished, on the main thread
+        for future in list(self.pending_assets):
+            if not wait and not future.done():
+                continue
+            key = self.pending_assets.pop(future)
+            try:
+                img, mask = future.result()
+            except Exception:
+                if key is None:
+                    image_path = self.manifest['background']['image']
+                    print(f"Warning: {image_path} not found. Using default background.")
+                continue
+
+            if key is None:
+                self.discard_scaled_surfaces(self.engine_background)
+                self.engine_background = img.convert()
+            else:
+                data = self.components[key]
+                self.discard_scaled_surfaces(data['original'])
+                img = img.convert_alpha()
+                data['image'] = img
+                data['mask'] = mask
+                data['original'] = img
+                self.update_pick_region(data['rect'])
+            self.invalidate_static_layer()
+
+        if not self.pending_assets and self.asset_loader is not None:
+            self.asset_loader.shutdown(wait=False)
+            self.asset_loader = None
+
+    def finish_startup_tasks(self):
+        while self.startup_tasks:
+            name, task = self.startup_tasks.popleft()
+            with self.startup.phase(name):
+                task()
+
+    def continue_startup(self):
+        # Called after every frame until setup is finished: one deferred setup step per frame
+        startup = self.startup
+        if startup.first_frame is None:
+            startup.first_frame = startup.elapsed()
+        if self.startup_tasks:
+            name, task = self.startup_tasks.popleft()
+            with startup.phase(name):
+                task()
+        elif not self.pending_assets:
+            startup.ready = startup.elapsed()
+            self.starting_up = False
+            if self.startup_report:
+                startup.report()
+
+    def wait_for_assets(self):
+        self.finish_startup_tasks()
+        self.install_loaded_assets(wait=True)
+        self.audio.wait_for_sounds()
 
-            # Calculate tooltip dimensions
-            line_height = self.tooltip_font.get_linesize()
-            tooltip_height = line_height * len(lines) + 20  # Add padding
-            tooltip_width = min(max_width, max([self.tooltip_font.size(line)[0] for line in lines])) + 20
+    def check_answer(self, selected_component):
+        asked = self.session.current_question
+        correct = self.session.answer(selected_component)
+        if correct is None:
+            return  # Still showing the feedback for the last answer, or the round is over
 
-            # Create tooltip background with semi-transparency
-            tooltip_surface = pygame.Surface((tooltip_width, tooltip_height), pygame.SRCALPHA)
-            tooltip_surface.fill((0, 0, 0, 180))  # Semi-transparent black
+        if self.analytics is not None:
+            response_ms = self.game_clock() - self.question_shown_at
+            self.analytics.record(self.analytics_session, asked, selected_component, response_ms, self.difficulty)
 
-            # Add border
-            pygame.draw.rect(tooltip_surface, WHITE, (0, 0, tooltip_width, tooltip_height), 1)
+        self.audio.play('correct' if correct else 'wrong')
 
-            # Render and position text
-            for i, line in enumerate(lines):
-                text_surface = self.tooltip_font.render(line, True, WHITE)
-                tooltip_surface.blit(text_surface, (10, 10 + i * line_height))
+        # Set a timer for the popup with enhanced styling
+        self.popup = {
+            'component': selected_component,
+            'position': self.components[selected_component]['position'],
+            'text': self.components[selected_component]['name'],
+            'correct': correct
+        }
+        popup = self.popup
+        self.scheduler.schedule(self.popup_duration, lambda: self.expire_popup(popup))
+
+        # Wait a moment before setting the next question, without blocking the game loop
+        self.scheduler.schedule(self.answer_delay, self.advance_question)
+
+    def start_question_timer(self):
+        # A new question is showing: time responses from now, and restart the hard mode countdown
+        self.question_shown_at = self.game_clock()
+        self.question_timer = self.time_per_question * 1000
+
+    def time_out_question(self):
+        # Timed out questions aren't logged to analytics, which only records clicks
+        self.session.time_out()
+        self.audio.play('wrong')
+        self.scheduler.schedule(self.answer_delay, self.advance_question)
+
+    def set_difficulty(self, difficulty):
+        # Hard mode hides the labels and gives every question a countdown
+        self.difficulty = difficulty
+        self.show_labels = difficulty != "hard"
+        self.start_question_timer()
+
+    def countdown_running(self):
+        session = self.session
+        return (self.difficulty == "hard" and session.game_state == GAME_PLAYING and
+                not session.awaiting_next_question)
+
+    def advance_game_time(self):
+        # Catch game time up with real time in fixed steps; timers and the countdown run in the steps
+        steps = self.game_clock.advance()
+        while steps:
+            self.step_simulation()
+            steps -= 1
+
+    def step_simulation(self):
+        # One fixed step of game time: due timers, then the hard mode countdown
+        self.game_clock.step()
+        self.scheduler.run_due()
+        if self.countdown_running():
+            self.question_timer = self.time_per_question * 1000 - (self.game_clock() - self.question_shown_at)
+            if self.question_timer <= 0:
+                self.time_out_question()
+
+    def expire_popup(self, popup):
+        # A newer answer may have replaced the popup in the meantime
+        if self.popup is popup:
+            self.popup = None
 
-            # Position tooltip on screen, ensuring it stays within screen boundaries
-            tooltip_x = min(self.tooltip['position'][0] - tooltip_width // 2, SCREEN_WIDTH - tooltip_width - 10)
-            tooltip_y = min(self.tooltip['position'][1], SCREEN_HEIGHT - tooltip_height - 10)
-            tooltip_x = max(10, tooltip_x)  # Ensure it doesn't go off left edge
+    def advance_question(self):
+        self.session.advance()
+        self.start_question_timer()
+        if self.session.game_state == GAME_WON:
+            self.audio.play('win')
+        elif self.session.game_state == GAME_LOST:
+            self.audio.play('lose')
 
-            self.screen.blit(tooltip_surface, (tooltip_x, tooltip_y))
+    def restart_game(self):
+        # Move on to the next bay if it has been prepared; otherwise replay this one rather than wait
+        # A recorded or replayed session waits for it instead, so both play the same bays
+        next_index = self.bank.next_index(self.bay_index)
+        wait = self.frame_clock is not None
+        bay = self.bank.take(next_index, wait) if next_index != self.bay_index else None
+        if bay is not None:
+            self.install_bay(next_index, bay)
+        else:
+            self.session.restart()
+            self.prefetch_next_bay()
+        self.start_question_timer()
+        self.invalidate_static_layer()
+
+    def install_bay(self, index, bay):
+        # Switch to a prepared bay; it is decoded, converted and indexed already, so this is cheap
+        if self.asset_loader is not None:
+            self.asset_loader.shutdown(wait=False, cancel_futures=True)  # The last bay's images are moot
+            self.asset_loader = None
+        self.pending_assets.clear()
+        self.scaled_surfaces.clear()
+        self.tooltip_cache.clear()
+
+        self.bay_index = index
+        self.manifest = bay['manifest']
+        self.asset_bundle = bay['bundle']
+        self.components = bay['components']
+        self.engine_background = bay['background']
+        self.pick_buffer = bay['pick_buffer']
+        self.pick_version += 1
+        self.component_descriptions = {entry['key']: entry['description']
+                                       for entry in self.manifest['components']}
+        self.popup = None
+        self.scheduler.cancel_all()  # Callbacks queued for the last bay, such as its popup expiring
+        self.session = QuizSession({key: data['name'] for key, data in self.components.items()}, self.rng)
+        if bay['font'] is self.font:  # Text prepared with a font from before a resize is no use
+            for (text, color), surface in bay['texts'].items():
+                self.text_cache.add(self.font, text, True, color, surface)
+        # Loading the next bay right away would compete with drawing the first frames of this one
+        self.scheduler.schedule(BAY_PREFETCH_DELAY, self.prefetch_next_bay)
+
+    def prefetch_next_bay(self):
+        next_index = self.bank.next_index(self.bay_index)
+        if next_index != self.bay_index:  # A single bay bank only ever shows the bay already loaded
+            self.bank.prefetch(next_index, self.font)
+
+    def start_recording(self, path):
+        self.begin_reproducible_session()
+        self.recorder = InputRecorder(path, {'seed': self.seed, 'output_size': list(self.screen_rect.size),
+                                             'bank': self.bank_path, 'difficulty': self.difficulty})
+
+    def start_replay(self, replay, throttled=True):
+        # Unthrottled replay runs frames back to back instead of at their recorded times
+        self.begin_reproducible_session()
+        self.replay = replay
+        self.replay_throttled = throttled
+        replay.start_time = time.perf_counter()
+
+    def begin_reproducible_session(self):
+        # Hit-testing mustn't depend on when images finish loading, and timers must fire in the
+        # same frames on replay, so load everything first and run game time frame by frame
+        self.wait_for_assets()
+        self.frame_clock = FrameClock()
+        self.game_clock.set_time_source(self.frame_clock)
+
+    def next_replay_frame(self):
+        # Live input is ignored during a replay, except for closing the window
+        if pygame.event.get(QUIT):
+            print("Replay stopped.")
+            pygame.quit()
+            sys.exit()
+        pygame.event.clear()
+
+        frame = self.replay.next_frame()
+        if frame is None:
+            self.quit()
+        now, events = frame
+        if self.replay_throttled:
+            delay = self.replay.start_time + now / 1000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.frame_clock.advance(now)
+        return events
+
+    def get_outcome(self):
+        # Where a session ended up, to check a replay against its recording
+        return {
+            'time': self.game_clock(),
+            'bay': self.bay_index,
+            'state': self.session.game_state,
+            'question': self.session.current_question,
+            'correct': self.session.correct_answers,
+            'answered': self.session.total_questions,
+        }
 
-        # Draw popup if active with enhanced styling
-        if self.popup and self.popup_timer > 0:
-            popup_color = GREEN if self.popup.get('correct', False) else RED
-            text = self.font.render(self.popup['text'], True, BLACK)
+    def handle_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        if self.recorder is not None:
+            self.recorder.record_frame(self.frame_clock(), events)
+        # Input is handled at the time it arrived, also after a long wait in power save mode
+        self.advance_game_time()
+        for event in events:
+            if event.type == QUIT:
+                self.quit()
 
-            # Position the popup above the component
-            popup_x = self.popup['position'][0] + engine_x
-            popup_y = self.popup['position'][1] - 60 + engine_y
-            text_rect = text.get_rect(center=(popup_x, popup_y))
+            # Handle key presses
+            elif event.type == KEYDOWN:
+                if event.key == K_r and self.session.game_state in (GAME_WON, GAME_LOST):
+                    self.restart_game()
+                elif event.key == K_ESCAPE:
+                    self.quit()
+                elif event.key == K_F3 and self.profiler.enabled:
+                    self.show_profiler_hud = not self.show_profiler_hud
 
-            # Create a more attractive popup with rounded corners effect
-            bg_rect = text_rect.inflate(40, 20)
+            # The window contents were lost, repaint everything on the next frame
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+                self.full_redraw = True
 
-            # Draw a semi-transparent backdrop for better visibility
-            backdrop = pygame.Surface((bg_rect.width + 20, bg_rect.height + 20))
-            backdrop.fill(BLACK)
-            backdrop.set_alpha(100)  # Semi-transparent
-            self.screen.blit(backdrop, (bg_rect.x - 10, bg_rect.y - 10))
+            # Handle mouse events
+            elif event.type == MOUSEMOTION:
+                self.mouse_pos = event.pos
 
-            # Main background with rounded corners
-            pygame.draw.rect(self.screen, WHITE, bg_rect, border_radius=10)
+            elif event.type == MOUSEBUTTONDOWN and event.button == 1:  # Left mouse button
+                self.mouse_pos = event.pos
+                if self.session.game_state == GAME_PLAYING:
+                    # Pixel-perfect detection through the pick buffer built from the component masks
+                    component = self.pick_component(event.pos)
+                    if component is not None:
+                        self.check_answer(component)
+
+    def quit(self):
+        if self.profiler.enabled and self.trace_path:
+            self.profiler.export_trace(self.trace_path)
+            print(f"Wrote frame trace to {self.trace_path}")
+        if self.analytics is not None:
+            self.analytics.close()  # Write out the last batch
+        if self.recorder is not None:
+            self.recorder.close(self.get_outcome())
+            print(f"Wrote session recording to {self.recorder.file.name}")
+        if self.replay is not None:
+            self.replay.finish(self.get_outcome())
+        self.bank.shutdown()
+        pygame.quit()
+        sys.exit()
+
+    def build_pick_buffer(self):
+        self.pick_buffer = PickBuffer(self.engine_background.get_size(), self.components)
+        self.pick_version += 1
+
+    def update_pick_region(self, region):
+        self.pick_buffer.update_region(region)
+        self.pick_version += 1
+
+    def pick_component(self, screen_pos):
+        # Map the mouse position back to logical coordinates, then into the engine area
+        engine_x, engine_y = self.get_engine_origin()
+        x, y = self.to_logical(screen_pos)
+        return self.pick_buffer.pick(x - engine_x, y - engine_y)
+
+    def move_component(self, component, position):
+        data = self.components[component]
+        old_rect = data['rect']
+        data['position'] = position
+        data['rect'] = data['image'].get_rect(center=position)
+
+        # Only the area the component left and the area it now covers need new pick IDs
+        self.update_pick_region(old_rect)
+        self.update_pick_region(data['rect'])
+        self.invalidate_static_layer()
 
-            # Colored border based on correct/incorrect
-            pygame.draw.rect(self.screen, popup_color, bg_rect, 3, border_radius=10)
+    def update(self):
+        # Pick up any images that finished loading in the background
+        if self.pending_assets:
+            self.install_loaded_assets()
 
-            # Add a small icon for correct/incorrect
-            icon_text = "✓" if self.popup.get('correct', False) else "✗"
-            icon = self.font.render(icon_text, True, popup_color)
-            self.screen.blit(icon, (bg_rect.left + 10, text_rect.top))
+        self.advance_game_time()
 
-            # Center the text a bit more to the right to make room for the icon
-            adjusted_text_rect = text_rect.move(10, 0)
-            self.screen.blit(text, adjusted_text_rect)
+        # Update hovered component and tooltip, only when the mouse or what is under it changed
+        mouse_pos = self.mouse_pos
+        if (mouse_pos == self.hover_mouse_pos and self.session.game_state == self.hover_game_state and
+                self.pick_version == self.hover_pick_version):
+            return
+        self.hover_mouse_pos = mouse_pos
+        self.hover_game_state = self.session.game_state
+        self.hover_pick_version = self.pick_version
+        self.hovered_component = None
+        self.tooltip = None
 
-        # Draw game stats and feedback with improved UI
+        if self.session.game_state == GAME_PLAYING:
+            with self.profiler.section('hover_pick'):
+                component = self.pick_component(mouse_pos)
+            if component is not None:
+                self.hovered_component = component
+
+                # Create tooltip with component description
+                if component in self.component_descriptions:
+                    data = self.components[component]
+                    engine_x, engine_y = self.get_engine_origin()
+                    tooltip_text = f"{data['name']}: {self.component_descriptions[component]}"
+                    self.tooltip = {
+                        'component': component,
+                        'text': tooltip_text,
+                        'position': (
+                            data['position'][0] + engine_x,
+                            data['position'][1] + engine_y + 50
+                        )
+                    }
+
+    def render_text(self, font, text, antialias, color):
+        # All text goes through the shared cache; the returned surface must not be modified
+        with self.profiler.section('render_text'):
+            return self.text_cache.render(font, text, antialias, color)
+
+    def get_static_layer_key(self):
+        # Everything the static layer depends on; a change forces a rebuild
+        return (self.session.game_state == GAME_PLAYING, self.show_labels, self.difficulty)
+
+    def static_layer_is_current(self):
+        # Same check as comparing get_static_layer_key(), without building a tuple every frame
+        key = self.static_layer_key
+        return (self.static_layer is not None and key[0] == (self.session.game_state == GAME_PLAYING) and
+                key[1] == self.show_labels and key[2] == self.difficulty)
+
+    def invalidate_static_layer(self):
+        self.static_layer = None
+
+    def build_static_layer(self):
+        # Pre-composite everything that stays put while a round is played
+        layer = self.static_layer_surface
+        layer.fill(BLACK)  # Letterbox bars when the window's aspect ratio differs
+        layer.set_clip(self.view_rect)
+        layer.fill(WHITE)
 
-        # Draw title with background
-        title_bg = pygame.Rect(0, 0, SCREEN_WIDTH, 60)
-        pygame.draw.rect(self.screen, (240, 240, 240), title_bg)
-        pygame.draw.line(self.screen, (200, 200, 200), (0, 60), (SCREEN_WIDTH, 60), 2)
+        # Draw engine background
+        engine_x, engine_y = self.get_engine_origin()
+        layer.blit(self.get_scaled_surface(self.engine_background), self.to_screen((engine_x, engine_y)))
 
-        title_text = self.large_font.render("Under the Hood Challenge", True, BLACK)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 15))
+        # Draw components in their regular, unhovered state
+        for component, data in self.components.items():
+            comp_pos = (data['position'][0] - data['rect'].width // 2 + engine_x,
+                        data['position'][1] - data['rect'].height // 2 + engine_y)
+            layer.blit(self.get_scaled_surface(data['original']), self.to_screen(comp_pos))
 
-        # Draw current score with a nice box
-        score_bg = pygame.Rect(20, 15, 100, 30)
-        pygame.draw.rect(self.screen, WHITE, score_bg)
-        pygame.draw.rect(self.screen, BLACK, score_bg, 2)
-        score_text = self.font.render(f"Score: {self.correct_answers}/{self.total_questions}", True, BLACK)
-        self.screen.blit(score_text, (25, 18))
+            # Draw component label if enabled
+            if self.show_labels:
+                layer.blits(self.get_label_blits(component, data, (engine_x, engine_y)))
+
+        # Draw title with background; the bars cover components, see build_hover_overlay
+        title_bg = self.to_screen_rect(pygame.Rect(0, 0, SCREEN_WIDTH, 60))
+        self.static_bar_rects = [
+            pygame.draw.rect(layer, (240, 240, 240), title_bg),
+            pygame.draw.line(layer, (200, 200, 200), self.to_screen((0, 60)), self.to_screen((SCREEN_WIDTH, 60)),
+                             self.scale_length(2)),
+        ]
 
-        # Draw current question/instruction panel
-        if self.game_state == GAME_PLAYING:
-            question_bg = pygame.Rect(SCREEN_WIDTH // 4, SCREEN_HEIGHT - 70, SCREEN_WIDTH // 2, 40)
-            pygame.draw.rect(self.screen, WHITE, question_bg)
-            pygame.draw.rect(self.screen, self.feedback_color, question_bg, 2)
-            feedback = self.font.render(self.feedback_text, True, self.feedback_color)
-            feedback_rect = feedback.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
-            self.screen.blit(feedback, feedback_rect)
-
-        # Draw game state-specific UI
-        if self.game_state == GAME_WON:
-            # Create a semi-transparent overlay
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 150))  # Semi-transparent black
-            self.screen.blit(overlay, (0, 0))
-
-            # Create a result panel
-            result_panel = pygame.Surface((400, 200))
-            result_panel.fill(WHITE)
-            panel_rect = result_panel.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-            pygame.draw.rect(result_panel, GREEN, (0, 0, 400, 50))
-
-            # Add content to the panel
-            win_text = self.large_font.render("✅ CONGRATULATIONS!", True, WHITE)
-            result_panel.blit(win_text, (400 // 2 - win_text.get_width() // 2, 10))
-
-            score_text = self.font.render(f"Your Score: {self.correct_answers}/{self.total_questions}", True, BLACK)
-            result_panel.blit(score_text, (400 // 2 - score_text.get_width() // 2, 80))
-
-            restart_text = self.font.render("Press R to play again", True, BLACK)
-            result_panel.blit(restart_text, (400 // 2 - restart_text.get_width() // 2, 130))
-
-            # Draw the panel
-            self.screen.blit(result_panel, panel_rect)
-
-        elif self.game_state == GAME_LOST:
-            # Create a semi-transparent overlay
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 150))  # Semi-transparent black
-            self.screen.blit(overlay, (0, 0))
-
-            # Create a result panel
-            result_panel = pygame.Surface((400, 200))
-            result_panel.fill(WHITE)
-            panel_rect = result_panel.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-            pygame.draw.rect(result_panel, RED, (0, 0, 400, 50))
-
-            # Add content to the panel
-            lose_text = self.large_font.render("❌ TRY AGAIN!", True, WHITE)
-            result_panel.blit(lose_text, (400 // 2 - lose_text.get_width() // 2, 10))
-
-            score_text = self.font.render(f"Your Score: {self.correct_answers}/{self.total_questions}", True, BLACK)
-            result_panel.blit(score_text, (400 // 2 - score_text.get_width() // 2, 80))
-
-            restart_text = self.font.render("Press R to restart", True, BLACK)
-            result_panel.blit(restart_text, (400 // 2 - restart_text.get_width() // 2, 130))
-
-            # Draw the panel
-            self.screen.blit(result_panel, panel_rect)
+        title_text = self.render_text(self.large_font, "Under the Hood Challenge", True, BLACK)
+        title_x, title_y = self.to_screen((SCREEN_WIDTH // 2, 15))
+        layer.blit(title_text, (title_x - title_text.get_width() // 2, title_y))
 
         # Instructions at the bottom
-        if self.game_state == GAME_PLAYING:
-            instructions_bg = pygame.Rect(0, SCREEN_HEIGHT - 30, SCREEN_WIDTH, 30)
-            pygame.draw.rect(self.screen, (240, 240, 240), instructions_bg)
-            instructions = self.small_font.render(
+        if self.session.game_state == GAME_PLAYING:
+            instructions_bg = self.to_screen_rect(pygame.Rect(0, SCREEN_HEIGHT - 30, SCREEN_WIDTH, 30))
+            self.static_bar_rects.append(pygame.draw.rect(layer, (240, 240, 240), instructions_bg))
+            instructions = self.render_text(
+                self.small_font,
                 "Click on components to identify them. Hover for info. Press ESC to quit.", True,
                 BLACK)
-            self.screen.blit(instructions, (SCREEN_WIDTH // 2 - instructions.get_width() // 2, SCREEN_HEIGHT - 25))
+            instructions_x, instructions_y = self.to_screen((SCREEN_WIDTH // 2, SCREEN_HEIGHT - 25))
+            layer.blit(instructions, (instructions_x - instructions.get_width() // 2, instructions_y))
+
+        layer.set_clip(None)
+        self.static_layer = layer
+        self.static_layer_blits = ((layer, (0, 0)),)  # Blit sequence for full frames, built once
+        self.static_layer_key = self.get_static_layer_key()
+        self.overlays = {}  # Overlays may depend on component positions, rebuild them too
+        self.overlay_cache.clear()
+        self.full_redraw = True
+
+    def get_label_rect(self, data, offset):
+        # Position the label near the component
+        return pygame.Rect(data['position'][0] - 15 + offset[0],
+                           data['position'][1] - data['rect'].height // 2 - 25 + offset[1], 30, 30)
+
+    def get_label_blits(self, component, data, offset):
+        label_rect = self.to_screen_rect(self.get_label_rect(data, offset))
+
+        # Draw the label text over the shared semi-transparent background
+        label = self.render_text(self.font, component, True, WHITE)
+        return [(self.label_background, label_rect.topleft),
+                (label, label.get_rect(center=label_rect.center).topleft)]
+
+    def fill_frame_state(self, state):
+        # Everything that affects what an overlay looks like, written into a preallocated list so
+        # that checking for changes doesn't allocate. OVERLAY_SLOTS maps overlays to these slots.
+        state[0] = self.hovered_component
+        state[1] = self.tooltip
+        state[2] = self.popup
+        state[3] = self.session.correct_answers
+        state[4] = self.session.total_questions
+        state[5] = self.session.feedback_text
+        state[6] = self.session.feedback_color
+        state[7] = self.session.game_state
+        state[8] = self.profiler.hud_lines if self.show_profiler_hud else None
+        state[9] = -(-self.question_timer // 1000) if self.countdown_running() else None  # Whole seconds left
+
+    def get_overlay_key(self, name):
+        # Identifies the look of an active overlay, so built overlays can be reused; None disables caching
+        if name == 'hover':
+            return self.hovered_component
+        elif name == 'tooltip':
+            return self.tooltip['component'], self.tooltip['text']
+        elif name == 'popup':
+            return self.popup['component'], self.popup['correct']
+        elif name == 'score':
+            return self.session.correct_answers, self.session.total_questions
+        elif name == 'timer':
+            return -(-self.question_timer // 1000)
+        elif name == 'feedback':
+            return self.session.feedback_text, self.session.feedback_color
+        return None  # Result screens reuse one preallocated surface, the profiler HUD changes constantly
+
+    def is_overlay_active(self, name):
+        if name == 'hover':
+            return self.hovered_component is not None
+        elif name == 'tooltip':
+            return self.tooltip is not None
+        elif name == 'popup':
+            return self.popup is not None
+        elif name == 'feedback':
+            return self.session.game_state == GAME_PLAYING
+        elif name == 'result':
+            return self.session.game_state != GAME_PLAYING
+        elif name == 'profiler':
+            return self.show_profiler_hud
+        elif name == 'timer':
+            return self.countdown_running()
+        return True
+
+    def get_highlight_sprite(self, data):
+        # Built once per component image and reused for every hover
+        source = self.get_scaled_surface(data['original'])
+        if data.get('highlight_source') is not source:
+            # Create a highlighted version with a glowing border
+            border = self.scale_length(5)
+            highlight_surface = pygame.Surface((source.get_width() + 2 * border, source.get_height() + 2 * border),
+                                               pygame.SRCALPHA)
+            highlight_surface.fill((0, 0, 0, 0))  # Transparent background
+
+            # Draw a 5px glowing border
+            pygame.draw.rect(highlight_surface, HIGHLIGHT_COLOR,
+                             (0, 0, highlight_surface.get_width(), highlight_surface.get_height()),
+                             border, border_radius=self.scale_length(10))
+
+            # Draw the component image in the center of the highlight
+            highlight_surface.blit(source, (border, border))
+            data['highlight'] = highlight_surface
+            data['highlight_source'] = source
+        return data['highlight']
+
+    def build_hover_overlay(self):
+        # Redraw the hovered area the way the static layer is drawn, with the hovered component
+        # swapped for its highlight, so components and labels keep overlapping it as usual
+        engine_x, engine_y = self.get_engine_origin()
+        hovered = self.components[self.hovered_component]
+        highlight_surface = self.get_highlight_sprite(hovered)
+
+        center_x, center_y = self.to_screen((hovered['position'][0] + engine_x, hovered['position'][1] + engine_y))
+        highlight_pos = (center_x - highlight_surface.get_width() // 2, center_y - highlight_surface.get_height() // 2)
+        area = highlight_surface.get_rect(topleft=highlight_pos)
+        if self.show_labels:
+            area.union_ip(self.to_screen_rect(self.get_label_rect(hovered, (engine_x, engine_y))))
+
+        overlay = pygame.Surface(area.size).convert()
+        overlay.fill(WHITE)
+        background_x, background_y = self.to_screen((engine_x, engine_y))
+        overlay.blit(self.get_scaled_surface(self.engine_background), (background_x - area.x, background_y - area.y))
+        for component, data in self.components.items():
+            if data is hovered:
+                sprite, (x, y) = highlight_surface, highlight_pos
+            else:
+                sprite = self.get_scaled_surface(data['original'])
+                x, y = self.to_screen((data['position'][0] - data['rect'].width // 2 + engine_x,
+                                       data['position'][1] - data['rect'].height // 2 + engine_y))
+            overlay.blit(sprite, (x - area.x, y - area.y))
+            if self.show_labels:
+                for surface, (x, y) in self.get_label_blits(component, data, (engine_x, engine_y)):
+                    overlay.blit(surface, (x - area.x, y - area.y))
+
+        # The title and instruction bars are drawn over the components
+        for rect in self.static_bar_rects:
+            rect = rect.clip(area)
+            if rect:
+                overlay.blit(self.static_layer, rect.move(-area.x, -area.y), rect)
+        return [(overlay, area.topleft)]
+
+    def wrap_tooltip_text(self, tooltip_text, max_width):
+        # Wrap text to multiple lines if needed
+        words = tooltip_text.split(' ')
+        lines = []
+        current_line = words[0]
+
+        for word in words[1:]:
+            test_line = current_line + ' ' + word
+            test_width = self.tooltip_font.size(test_line)[0]
+            if test_width < max_width:
+                current_line = test_line
+            else:
+                lines.append(current_line)
+                current_line = word
+        lines.append(current_line)  # Add the last line
+        return lines
+
+    def get_tooltip_surface(self, component, tooltip_text):
+        # Tooltips are laid out and rendered once per component, until its text or the font changes
+        cached = self.tooltip_cache.get(component)
+        if cached and cached[0] is self.tooltip_font and cached[1] == tooltip_text:
+            return cached[2]
+
+        max_width = self.scale_length(400)
+        padding = self.scale_length(10)
+        lines = self.wrap_tooltip_text(tooltip_text, max_width)
+
+        # Calculate tooltip dimensions
+        line_height = self.tooltip_font.get_linesize()
+        tooltip_height = line_height * len(lines) + 2 * padding  # Add padding
+        tooltip_width = min(max_width, max([self.tooltip_font.size(line)[0] for line in lines])) + 2 * padding
+
+        # Create tooltip background with semi-transparency
+        tooltip_surface = pygame.Surface((tooltip_width, tooltip_height), pygame.SRCALPHA)
+        tooltip_surface.fill((0, 0, 0, 180))  # Semi-transparent black
+
+        # Add border
+        pygame.draw.rect(tooltip_surface, WHITE, (0, 0, tooltip_width, tooltip_height), 1)
+
+        # Render and position text
+        for i, line in enumerate(lines):
+            text_surface = self.render_text(self.tooltip_font, line, True, WHITE)
+            tooltip_surface.blit(text_surface, (padding, padding + i * line_height))
+
+        self.tooltip_cache[component] = (self.tooltip_font, tooltip_text, tooltip_surface)
+        return tooltip_surface
+
+    def build_tooltip_overlay(self):
+        tooltip_surface = self.get_tooltip_surface(self.tooltip['component'], self.tooltip['text'])
+        tooltip_width, tooltip_height = tooltip_surface.get_size()
+
+        # Position tooltip on screen, ensuring it stays within screen boundaries
+        margin = self.scale_length(10)
+        view = self.view_rect
+        anchor_x, anchor_y = self.to_screen(self.tooltip['position'])
+        tooltip_x = min(anchor_x - tooltip_width // 2, view.right - tooltip_width - margin)
+        tooltip_y = min(anchor_y, view.bottom - tooltip_height - margin)
+        tooltip_x = max(view.left + margin, tooltip_x)  # Ensure it doesn't go off left edge
+
+        return [(tooltip_surface, (tooltip_x, tooltip_y))]
+
+    def build_popup_overlay(self):
+        engine_x, engine_y = self.get_engine_origin()
+        popup_color = GREEN if self.popup.get('correct', False) else RED
+        text = self.render_text(self.font, self.popup['text'], True, BLACK)
+
+        # Position the popup above the component
+        popup_x = self.popup['position'][0] + engine_x
+        popup_y = self.popup['position'][1] - 60 + engine_y
+        text_rect = text.get_rect(center=self.to_screen((popup_x, popup_y)))
+
+        # Create a more attractive popup with rounded corners effect
+        bg_rect = text_rect.inflate(self.scale_length(40), self.scale_length(20))
+        backdrop_rect = bg_rect.inflate(self.scale_length(20), self.scale_length(20))
+        radius = self.scale_length(10)
+
+        # Draw everything relative to the semi-transparent backdrop
+        popup_surface = pygame.Surface(backdrop_rect.size, pygame.SRCALPHA)
+        popup_surface.fill((0, 0, 0, 100))
+        bg_rect.move_ip(-backdrop_rect.x, -backdrop_rect.y)
+        text_rect.move_ip(-backdrop_rect.x, -backdrop_rect.y)
+
+        # Main background with rounded corners
+        pygame.draw.rect(popup_surface, WHITE, bg_rect, border_radius=radius)
+
+        # Colored border based on correct/incorrect
+        pygame.draw.rect(popup_surface, popup_color, bg_rect, self.scale_length(3), border_radius=radius)
+
+        # Add a small icon for correct/incorrect
+        icon_text = "✓" if self.popup.get('correct', False) else "✗"
+        icon = self.render_text(self.font, icon_text, True, popup_color)
+        popup_surface.blit(icon, (bg_rect.left + self.scale_length(10), text_rect.top))
+
+        # Center the text a bit more to the right to make room for the icon
+        adjusted_text_rect = text_rect.move(self.scale_length(10), 0)
+        popup_surface.blit(text, adjusted_text_rect)
+
+        return [(popup_surface, backdrop_rect.topleft)]
+
+    def build_boxed_text_overlay(self, box_rect, text, text_pos, border_color):
+        # A white box with a border and a line of text that may overflow the box, in screen coordinates
+        area = box_rect.union(text.get_rect(topleft=text_pos))
+        surface = pygame.Surface(area.size, pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 0))
+        local_box = box_rect.move(-area.x, -area.y)
+        pygame.draw.rect(surface, WHITE, local_box)
+        pygame.draw.rect(surface, border_color, local_box, self.scale_length(2))
+        surface.blit(text, (text_pos[0] - area.x, text_pos[1] - area.y))
+        return [(surface, area.topleft)]
+
+    def build_score_overlay(self):
+        # Draw current score with a nice box
+        score_bg = self.to_screen_rect(pygame.Rect(20, 15, 100, 30))
+        session = self.session
+        score_text = self.render_text(self.font, f"Score: {session.correct_answers}/{session.total_questions}", True, BLACK)
+        return self.build_boxed_text_overlay(score_bg, score_text, self.to_screen((25, 18)), BLACK)
+
+    def build_timer_overlay(self):
+        # Hard mode countdown, turning red for the last few seconds
+        seconds = -(-self.question_timer // 1000)
+        color = RED if seconds <= 3 else BLACK
+        timer_bg = self.to_screen_rect(pygame.Rect(SCREEN_WIDTH - 120, 15, 100, 30))
+        timer_text = self.render_text(self.font, f"Time: {seconds}", True, color)
+        return self.build_boxed_text_overlay(timer_bg, timer_text, self.to_screen((SCREEN_WIDTH - 115, 18)), color)
+
+    def build_feedback_overlay(self):
+        # Draw current question/instruction panel
+        question_bg = self.to_screen_rect(pygame.Rect(SCREEN_WIDTH // 4, SCREEN_HEIGHT - 70, SCREEN_WIDTH // 2, 40))
+        feedback = self.render_text(self.font, self.session.feedback_text, True, self.session.feedback_color)
+        feedback_rect = feedback.get_rect(center=self.to_screen((SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50)))
+        return self.build_boxed_text_overlay(question_bg, feedback, feedback_rect.topleft, self.session.feedback_color)
+
+    def build_result_overlay(self):
+        if self.session.game_state == GAME_WON:
+            banner_color, banner_text, restart_hint = GREEN, "✅ CONGRATULATIONS!", "Press R to play again"
+        else:
+            banner_color, banner_text, restart_hint = RED, "❌ TRY AGAIN!", "Press R to restart"
+
+        # Redraw the preallocated semi-transparent overlay
+        overlay = self.result_overlay
+        overlay.fill((0, 0, 0, 150))  # Semi-transparent black
+
+        # Redraw the preallocated result panel
+        result_panel = self.result_panel
+        result_panel.fill(WHITE)
+        panel_rect = result_panel.get_rect(center=self.to_screen((SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)))
+        panel_center = panel_rect.width // 2
+        pygame.draw.rect(result_panel, banner_color, (0, 0, panel_rect.width, self.scale_length(50)))
+
+        # Add content to the panel
+        banner = self.render_text(self.large_font, banner_text, True, WHITE)
+        result_panel.blit(banner, (panel_center - banner.get_width() // 2, self.scale_length(10)))
+
+        session = self.session
+        score_text = self.render_text(self.font, f"Your Score: {session.correct_answers}/{session.total_questions}",
+                                      True, BLACK)
+        result_panel.blit(score_text, (panel_center - score_text.get_width() // 2, self.scale_length(80)))
+
+        restart_text = self.render_text(self.font, restart_hint, True, BLACK)
+        result_panel.blit(restart_text, (panel_center - restart_text.get_width() // 2, self.scale_length(130)))
+
+        # Draw the panel
+        overlay.blit(result_panel, panel_rect)
+        return [(overlay, (0, 0))]
+
+    def build_profiler_overlay(self):
+        # Small translucent panel in the top right corner with the latest frame statistics
+        lines = [self.render_text(self.tooltip_font, line, True, WHITE) for line in self.profiler.hud_lines]
+        padding_x, padding_y = self.scale_length(8), self.scale_length(6)
+        width = max([line.get_width() for line in lines] + [0]) + 2 * padding_x
+        line_height = self.tooltip_font.get_linesize()
+        hud = pygame.Surface((width, line_height * len(lines) + 2 * padding_y), pygame.SRCALPHA)
+        hud.fill((0, 0, 0, 180))
+        for i, line in enumerate(lines):
+            hud.blit(line, (padding_x, padding_y + i * line_height))
+        return [(hud, (self.view_rect.right - width - self.scale_length(10), self.to_screen((0, 70))[1]))]
+
+    def get_overlay(self, name):
+        key = self.get_overlay_key(name)
+        if key is not None:
+            cache_key = (name, key)
+            overlay = self.overlay_cache.get(cache_key)
+            if overlay is not None:
+                self.overlay_cache.move_to_end(cache_key)
+                return overlay
+
+        blits = getattr(self, f"build_{name}_overlay")()
+        rects = [surface.get_rect(topleft=pos) for surface, pos in blits]
+        overlay = (blits, rects[0].unionall(rects[1:]))
+        if key is not None:
+            self.overlay_cache[cache_key] = overlay
+            if len(self.overlay_cache) > OVERLAY_CACHE_SIZE:
+                self.overlay_cache.popitem(last=False)
+        return overlay
+
+    def update_overlays(self, frame_state, previous_state):
+        # Refresh the overlays whose state slots changed and collect the screen areas they touch
+        dirty_rects = self.dirty_rects
+        dirty_rects.clear()
+        for name, slots in OVERLAY_SLOTS:
+            if not self.full_redraw:
+                for slot in slots:
+                    if frame_state[slot] != previous_state[slot]:
+                        break
+                else:
+                    continue  # Unchanged
+
+            old = self.overlays.pop(name, None)
+            if old is not None:
+                dirty_rects.append(old[1])
+            if self.is_overlay_active(name):
+                overlay = self.get_overlay(name)
+                self.overlays[name] = overlay
+                dirty_rects.append(overlay[1])
+        return dirty_rects
+
+    def composite(self, area=None):
+        # Static layer first, then every active overlay on top, limited to area if given
+        if area is None:
+            self.screen.blits(self.static_layer_blits, doreturn=False)
+        else:
+            self.screen.blit(self.static_layer, area, area)
+        for name, slots in OVERLAY_SLOTS:
+            overlay = self.overlays.get(name)
+            if overlay is not None and (area is None or overlay[1].colliderect(area)):
+                self.screen.blits(overlay[0], doreturn=False)
 
-        pygame.display.flip()
+    def draw(self):
+        # Returns the screen areas pushed to the display, empty when the frame was unchanged.
+        # Counting them is left to the caller: growing totals would allocate on every frame.
+        if not self.static_layer_is_current():
+            with self.profiler.section('static_layer'):
+                self.build_static_layer()
+
+        frame_state = self.frame_state
+        previous_state = self.last_frame_state
+        self.fill_frame_state(frame_state)
+        if not self.full_redraw and frame_state == previous_state:
+            # Nothing changed, the screen already holds this frame
+            if self.render_mode == RENDER_DIRTY_RECTS:
+                return ()  # And the display shows it
+            pygame.display.flip()  # Outside a profiler section, as entering a with block allocates
+            return self.full_screen_rects
+
+        with self.profiler.section('overlays'):
+            dirty_rects = self.update_overlays(frame_state, previous_state)
+        self.frame_state, self.last_frame_state = previous_state, frame_state
+
+        view_rect = self.view_rect  # Overlays never draw over the letterbox bars
+        if self.render_mode == RENDER_FULL_FLIP or self.full_redraw:
+            with self.profiler.section('composite'):
+                self.screen.set_clip(view_rect)
+                self.composite()
+                self.screen.set_clip(None)
+            with self.profiler.section('present'):
+                pygame.display.flip()
+            presented = self.full_screen_rects
+        else:
+            # Recomposite and push the old and new area of every overlay whose state changed
+            for i, rect in enumerate(dirty_rects):
+                dirty_rects[i] = rect.clip(view_rect)
+
+            with self.profiler.section('composite'):
+                for rect in dirty_rects:
+                    self.screen.set_clip(rect)
+                    self.composite(rect)
+                self.screen.set_clip(None)
+
+            with self.profiler.section('present'):
+                pygame.display.update(dirty_rects)
+            presented = dirty_rects
+
+        self.full_redraw = False
+        return presented
+
+    def get_idle_timeout(self):
+        # Milliseconds until something other than input needs a frame. Never more than the game
+        # clock catches up in one frame, or a long idle wait would be dropped as a stall.
+        timeouts = [MAX_CATCH_UP]
+        next_due = self.scheduler.next_due()
+        if next_due is not None:
+            timeouts.append(next_due - self.game_clock())
+        if self.countdown_running():
+            timeouts.append(self.question_timer % 1000 or 1000)  # Next change of the seconds shown
+        if self.startup_tasks:
+            timeouts.append(1)  # Setup steps left to run after the first frame
+        if self.pending_assets:
+            timeouts.append(ASSET_POLL_INTERVAL)
+        if self.show_profiler_hud:
+            timeouts.append(500)  # HUD refresh interval
+        return max(1, min(timeouts))
+
+    def wait_for_events(self):
+        # Block until input arrives or the next timer is due; NOEVENT means a timer woke us up
+        event = pygame.event.wait(self.get_idle_timeout())
+        if event.type == NOEVENT:
+            return []
+        return [event] + pygame.event.get()
 
     def run(self):
+        profiler = self.profiler
         while True:
-            self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            events = None
+            if self.replay is not None:
+                with profiler.section('wait'):
+                    events = self.next_replay_frame()
+            elif self.loop_mode == LOOP_POWER_SAVE:
+                with profiler.section('wait'):
+                    events = self.wait_for_events()
+            if self.recorder is not None:
+                self.frame_clock.advance()
+
+            profiler.begin_frame()
+            with profiler.section('handle_events'):
+                self.handle_events(events)
+            with profiler.section('update'):
+                self.update()
+            with profiler.section('draw'):
+                self.draw()
+            profiler.end_frame(self.clock)
+            if self.starting_up:
+                self.continue_startup()
+            if self.replay is None:  # Replayed frames keep their recorded times, or run flat out
+                with profiler.section('tick'):
+                    self.clock.tick(FPS)
+
+
+def parse_resolution(text):
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"resolution must be positive, got {text!r}")
+    return width, height
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Under the Hood Challenge")
+    parser.add_argument('--full-flip', action='store_true', help="redraw and flip the whole screen every frame")
+    parser.add_argument('--power-save', action='store_true', help="sleep between frames until input or a timer")
+    parser.add_argument('--profile', action='store_true', help="time frame phases and show the HUD (F3)")
+    parser.add_argument('--trace', metavar='PATH', help="with --profile, write a Chrome trace file on quit")
+    parser.add_argument('--analytics', metavar='PATH', default=ANALYTICS_PATH,
+                        help=f"SQLite file answers are logged to (default {ANALYTICS_PATH})")
+    parser.add_argument('--no-analytics', dest='analytics', action='store_const', const=None,
+                        help="don't log answers")
+    parser.add_argument('--resolution', metavar='WxH', type=parse_resolution,
+                        help=f"window size, the game is scaled to fit (default {SCREEN_WIDTH}x{SCREEN_HEIGHT})")
+    parser.add_argument('--bank', metavar='PATH', default=BANK_PATH,
+                        help=f"question bank listing the engine bays to play (default {BANK_PATH})")
+    parser.add_argument('--difficulty', choices=("easy", "normal", "hard"), default="normal",
+                        help="hard hides the labels and gives each question a countdown")
+    parser.add_argument('--startup-report', action='store_true', help="print where startup time went")
+    parser.add_argument('--seed', type=int, help="seed for the question order, to make a session reproducible")
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument('--record', metavar='PATH', help="record the session's input to replay it later")
+    recording.add_argument('--replay', metavar='PATH', help="replay a recorded session")
+    parser.add_argument('--unthrottled', action='store_true',
+                        help="with --replay, run frames back to back instead of in real time")
+    args = parser.parse_args()
+    if args.unthrottled and not args.replay:
+        parser.error("--unthrottled only applies to --replay")
+    if args.trace and not args.profile:
+        parser.error("--trace needs --profile")
+    return args
 
 
 # Run the game
 if __name__ == "__main__":
-    game = UnderTheHoodGame()
+    args = parse_args()
+    seed, output_size, bank_path, analytics_path = args.seed, args.resolution, args.bank, args.analytics
+    difficulty = args.difficulty
+    if args.record and seed is None:
+        seed = random.randrange(2 ** 32)  # Recordings always have a seed, so they can be replayed
+    replay = None
+    if args.replay:
+        # Replays run in the recorded setup, and their answers were logged when they were played
+        replay = InputReplay(args.replay)
+        seed, bank_path, difficulty = replay.header['seed'], replay.header['bank'], replay.header['difficulty']
+        output_size = tuple(replay.header['output_size'])
+        analytics_path = None
+
+    game = UnderTheHoodGame(render_mode=RENDER_FULL_FLIP if args.full_flip else RENDER_DIRTY_RECTS,
+                            profile=args.profile, trace_path=args.trace,
+                            loop_mode=LOOP_POWER_SAVE if args.power_save else LOOP_CONTINUOUS,
+                            output_size=output_size, analytics_path=analytics_path, bank_path=bank_path, seed=seed,
+                            startup_report=args.startup_report)
+    game.set_difficulty(difficulty)
+    if args.record:
+        game.start_recording(args.record)
+    elif replay is not None:
+        game.start_replay(replay, throttled=not args.unthrottled)
     game.run()
\ No newline at end of file